@@ -82,9 +82,11 @@ def convert_pdf_to_pptx(pdf_path: str, output_path: str, config: Dict[str, Any])
     logger = logging.getLogger(__name__)
     
     try:
-        # Step 1: Parse PDF
+        # Steps 1-3: Parse PDF, analyze layout and build slide models
+        # Pages are streamed through all three steps, so only one page's raw
+        # parser output (with its image data) is held at a time
         logger.info("=" * 60)
-        logger.info("Step 1: Parsing PDF")
+        logger.info("Steps 1-3: Parsing PDF, Analyzing Layout, Building Slide Models")
         logger.info("=" * 60)
         
         parser = PDFParser(config['parser'])
@@ -92,36 +94,22 @@ def convert_pdf_to_pptx(pdf_path: str, output_path: str, config: Dict[str, Any])
             logger.error("Failed to open PDF file")
             return False
         
-        all_pages = parser.extract_all_pages()
-        parser.close()
-        
-        logger.info(f"Extracted {len(all_pages)} pages from PDF")
-        
-        # Step 2: Analyze Layout
-        logger.info("=" * 60)
-        logger.info("Step 2: Analyzing Layout")
-        logger.info("=" * 60)
-        
         analyzer = LayoutAnalyzerV2(config['analyzer'])
-        analyzed_pages = []
-        
-        for page_data in all_pages:
-            layout_data = analyzer.analyze_page(page_data)
-            analyzed_pages.append(layout_data)
-            logger.info(f"Page {layout_data['page_num'] + 1}: Found {len(layout_data['layout'])} regions")
-        
-        # Step 3: Build Slide Models
-        logger.info("=" * 60)
-        logger.info("Step 3: Building Slide Models")
-        logger.info("=" * 60)
-        
         mapper = CoordinateMapper(config['rebuilder'])
         slide_models = []
         
-        for layout_data in analyzed_pages:
-            slide_model = mapper.create_slide_model(layout_data)
-            slide_models.append(slide_model)
-            logger.info(f"Slide {slide_model.slide_number + 1}: {len(slide_model.elements)} elements")
+        try:
+            for page_data in parser.iter_pages():
+                layout_data = analyzer.analyze_page(page_data)
+                logger.info(f"Page {layout_data['page_num'] + 1}: Found {len(layout_data['layout'])} regions")
+                
+                slide_model = mapper.create_slide_model(layout_data)
+                slide_models.append(slide_model)
+                logger.info(f"Slide {slide_model.slide_number + 1}: {len(slide_model.elements)} elements")
+        finally:
+            parser.close()
+        
+        logger.info(f"Extracted {len(slide_models)} pages from PDF")
         
         # Step 4: Generate PPTX
         logger.info("=" * 60)
@@ -3,6 +3,7 @@ Layout Analyzer V2 - Improved layout analysis with better text grouping
 """
 
 import logging
+import math
 import re
 from typing import List, Dict, Any
 from ..parser.element_extractor import ElementExtractor
@@ -76,13 +77,13 @@ class LayoutAnalyzerV2:
             r1, g1, b1 = int(c1[0:2], 16), int(c1[2:4], 16), int(c1[4:6], 16)
             r2, g2, b2 = int(c2[0:2], 16), int(c2[2:4], 16), int(c2[4:6], 16)
             
-            # 计算欧几里得距离
-            distance = ((r1-r2)**2 + (g1-g2)**2 + (b1-b2)**2) ** 0.5
+            # 计算欧几里得距离的平方（避免开方）
+            distance_sq = (r1-r2)**2 + (g1-g2)**2 + (b1-b2)**2
             
-            # 阈值转换为欧几里得空间（sqrt(3) * threshold）
-            max_distance = (threshold ** 2 * 3) ** 0.5
+            # 阈值转换为欧几里得空间（sqrt(3) * threshold），同样取平方
+            max_distance_sq = threshold ** 2 * 3
             
-            return distance <= max_distance
+            return distance_sq <= max_distance_sq
         except ValueError:
             # 解析失败，使用严格匹配
             return color1 == color2
@@ -176,14 +177,14 @@ class LayoutAnalyzerV2:
         """
         page_width = page_data.get('width', 0)
         page_height = page_data.get('height', 0)
-        elements = page_data.get('elements', [])
         
-        # Separate elements by type
-        text_elements = ElementExtractor.get_text_elements(page_data)
-        image_elements = ElementExtractor.get_image_elements(page_data)
-        shape_elements = ElementExtractor.get_shape_elements(page_data)
+        # Separate elements by type (single pass over the page)
+        elements_by_type = ElementExtractor.bucket_by_type(page_data)
+        text_elements = elements_by_type['text']
+        image_elements = elements_by_type['image']
+        shape_elements = elements_by_type['shape']
         # NEW: Extract table elements
-        table_elements = [e for e in elements if e.get('type') == 'table']
+        table_elements = elements_by_type['table']
         
         layout_regions = []
         
@@ -399,8 +400,8 @@ class LayoutAnalyzerV2:
                     other_center_y = (other_y + other_y2) / 2
                     
                     # Euclidean distance
-                    distance = ((elem_center_x - other_center_x) ** 2 + 
-                               (elem_center_y - other_center_y) ** 2) ** 0.5
+                    distance = math.hypot(elem_center_x - other_center_x,
+                                          elem_center_y - other_center_y)
                     
                     # Check if this is bracket-related text
                     elem_text = elem.get('content', '')
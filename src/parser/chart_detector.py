@@ -2,12 +2,204 @@
 Chart Detector - Detects chart regions containing complex vector graphics
 """
 
+import io
 import logging
-from typing import List, Dict, Any, Tuple, Optional
+import math
+import os
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, NamedTuple, Union
 import fitz
+import numpy as np
+from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+# Fill colors that do not count as chart color coding
+_BLACK_WHITE = frozenset(('#FFFFFF', '#000000'))
+
+
+class _ShapeColumns(NamedTuple):
+    """
+    Struct-of-arrays view of a list of shape dicts.
+    
+    Each field is one contiguous array indexed by shape position, so the
+    chart heuristics can use vectorized masks instead of per-shape dict lookups.
+    """
+    x: np.ndarray
+    y: np.ndarray
+    x2: np.ndarray
+    y2: np.ndarray
+    width: np.ndarray
+    height: np.ndarray
+    fill_id: np.ndarray  # int32 interned fill color, -1 for unfilled shapes
+    fill_bw: np.ndarray  # bool, fill is black or white
+    
+    def take(self, indices: np.ndarray) -> '_ShapeColumns':
+        """Select the rows at the given indices from every column."""
+        return _ShapeColumns(*(column[indices] for column in self))
+
+
+def _shape_columns(shapes: List[Dict[str, Any]]) -> _ShapeColumns:
+    """Parse shape dicts once into a _ShapeColumns struct-of-arrays."""
+    count = len(shapes)
+    
+    def column(key: str) -> np.ndarray:
+        return np.fromiter((shape[key] for shape in shapes), dtype=np.float64, count=count)
+    
+    # Intern fill color strings once so later comparisons are integer compares
+    color_ids: Dict[str, int] = {}
+    colors = [shape.get('fill_color') for shape in shapes]
+    fill_id = np.fromiter(
+        (color_ids.setdefault(color, len(color_ids)) if color else -1 for color in colors),
+        dtype=np.int32, count=count
+    )
+    fill_bw = np.fromiter((color in _BLACK_WHITE for color in colors), dtype=np.bool_, count=count)
+    
+    return _ShapeColumns(
+        column('x'), column('y'), column('x2'), column('y2'),
+        column('width'), column('height'), fill_id, fill_bw
+    )
+
+
+def _encode_png(raster: Tuple[bytes, int, int, int]) -> bytes:
+    """Encode raw RGB samples from render_chart_as_image(fmt='raw') as PNG."""
+    samples, width, height, _ = raster
+    buffer = io.BytesIO()
+    Image.frombuffer("RGB", (width, height), samples, "raw", "RGB", 0, 1).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# Offsets of a grid cell and its 8 neighbours
+_NEIGHBOUR_OFFSETS = tuple((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+
+def _bucket_centers(center_x: np.ndarray, center_y: np.ndarray,
+                    threshold_sq: float) -> Tuple[List[Tuple[int, int]], Dict[Tuple[int, int], np.ndarray]]:
+    """
+    Bucket shape centers into a grid of threshold-sized cells.
+    
+    Any two centers within the threshold of each other fall into the same
+    or adjacent cells, so neighbour searches only need the 3x3 block of
+    cells around a shape instead of the whole page.
+    
+    Returns:
+        Tuple of (cell key per shape, cell key -> ascending shape indices)
+    """
+    cell_size = math.sqrt(threshold_sq) or 1.0
+    keys = [
+        (math.floor(cx / cell_size), math.floor(cy / cell_size))
+        for cx, cy in zip(center_x.tolist(), center_y.tolist())
+    ]
+    
+    cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for i, key in enumerate(keys):
+        cells[key].append(i)
+    
+    return keys, {key: np.array(members) for key, members in cells.items()}
+
+
+def _cluster_by_distance(center_x: np.ndarray, center_y: np.ndarray, threshold_sq: float) -> np.ndarray:
+    """
+    Greedily label shapes by the distance between their centers.
+    
+    Each not-yet-labelled shape (in input order) seeds a new cluster that
+    takes every other unlabelled shape whose center lies within threshold
+    of the seed. Only shapes in the seed's neighbouring grid cells are
+    tested, and their distances are kept squared so no square root is taken.
+    
+    Args:
+        center_x: Shape center x coordinates
+        center_y: Shape center y coordinates
+        threshold_sq: Squared maximum center distance to join the seed's cluster
+        
+    Returns:
+        int32 array of cluster labels, numbered in seed order
+    """
+    keys, cells = _bucket_centers(center_x, center_y, threshold_sq)
+    labels = np.full(len(center_x), -1, dtype=np.int32)
+    next_label = 0
+    
+    for i, (gx, gy) in enumerate(keys):
+        if labels[i] >= 0:
+            continue
+        
+        near = np.concatenate([
+            cells[key] for key in ((gx + dx, gy + dy) for dx, dy in _NEIGHBOUR_OFFSETS)
+            if key in cells
+        ])
+        near = near[labels[near] < 0]
+        dx = center_x[near] - center_x[i]
+        dy = center_y[near] - center_y[i]
+        labels[near[dx * dx + dy * dy <= threshold_sq]] = next_label
+        next_label += 1
+    
+    return labels
+
+
+def _find_root(parent: List[int], i: int) -> int:
+    """Find the union-find root of i, compressing the path behind it."""
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+def _cluster_by_connectivity(center_x: np.ndarray, center_y: np.ndarray, threshold_sq: float) -> np.ndarray:
+    """
+    Label shapes by the connected components of their center-distance graph.
+    
+    Two shapes are linked when their centers lie within the threshold, and
+    links are transitive (A-B and B-C put A, B and C in one cluster even if
+    A-C is farther apart), so the result does not depend on input order.
+    Linked pairs from neighbouring grid cells are merged with union-find
+    (union by rank, path compression).
+    
+    Args:
+        center_x: Shape center x coordinates
+        center_y: Shape center y coordinates
+        threshold_sq: Squared maximum center distance between linked shapes
+        
+    Returns:
+        int32 array of cluster labels, numbered by each cluster's first shape
+    """
+    count = len(center_x)
+    parent = list(range(count))
+    rank = [0] * count
+    _, cells = _bucket_centers(center_x, center_y, threshold_sq)
+    
+    # Pair each cell with itself and half of its neighbours so each cell pair is tested once
+    for (gx, gy), idx_a in cells.items():
+        for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+            idx_b = cells.get((gx + dx, gy + dy))
+            if idx_b is None:
+                continue
+            
+            ddx = center_x[idx_a][:, None] - center_x[idx_b][None, :]
+            ddy = center_y[idx_a][:, None] - center_y[idx_b][None, :]
+            rows, cols = np.nonzero(ddx * ddx + ddy * ddy <= threshold_sq)
+            
+            for i, j in zip(idx_a[rows].tolist(), idx_b[cols].tolist()):
+                root_i = _find_root(parent, i)
+                root_j = _find_root(parent, j)
+                if root_i == root_j:
+                    continue
+                if rank[root_i] < rank[root_j]:
+                    root_i, root_j = root_j, root_i
+                parent[root_j] = root_i
+                if rank[root_i] == rank[root_j]:
+                    rank[root_i] += 1
+    
+    labels = np.empty(count, dtype=np.int32)
+    label_of_root: Dict[int, int] = {}
+    for i in range(count):
+        labels[i] = label_of_root.setdefault(_find_root(parent, i), len(label_of_root))
+    
+    return labels
+
 
 class ChartDetector:
     """
@@ -27,9 +219,17 @@ class ChartDetector:
         # 增大距离阈值，让更多相关的shapes聚成一个cluster
         # 第14页的饼图分散较广，需要更大的阈值
         self.cluster_distance_threshold = config.get('cluster_distance_threshold', 200)
+        # 'seed': each shape joins the first earlier seed within the threshold
+        # 'connected': chains of nearby shapes form one cluster (transitive)
+        self.cluster_linkage = config.get('chart_cluster_linkage', 'seed')
         # 降低最小面积要求，让小饼图也能被检测到
         self.min_chart_area = config.get('min_chart_area', 3000)  # pixels²
         self.chart_render_dpi = config.get('chart_render_dpi', 300)
+        # Upper bound on the longer side of a rendered chart, in pixels
+        self.chart_max_render_px = config.get('chart_max_render_px', 8192)
+        # Rendered PNGs keyed by (page number, rounded bbox, dpi), least recently used first
+        self.chart_png_cache_size = config.get('chart_png_cache_size', 64)
+        self._png_cache: 'OrderedDict[Tuple[int, Tuple[float, ...], int], bytes]' = OrderedDict()
         
     def detect_chart_regions(self, page: fitz.Page, shapes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -45,23 +245,33 @@ class ChartDetector:
         if len(shapes) < self.min_shapes_for_chart:
             return []
         
+        # Read the page size once; every page.rect access builds a new Rect
+        page_rect = page.rect
+        page_width = page_rect.width
+        page_height = page_rect.height
+        
+        # Parse the shape dicts once into column arrays shared by the steps below
+        columns = _shape_columns(shapes)
+        
         # Filter out page-wide backgrounds and tiny decorations
-        candidate_shapes = self._filter_candidate_shapes(shapes, page)
+        candidate_indices = self._filter_candidate_shapes(columns, page_width, page_height)
         
-        if len(candidate_shapes) < self.min_shapes_for_chart:
+        if len(candidate_indices) < self.min_shapes_for_chart:
             return []
         
+        candidate_columns = columns.take(candidate_indices)
+        
         # Cluster shapes by spatial proximity
-        clusters = self._cluster_shapes(candidate_shapes)
+        clusters = self._cluster_shapes(candidate_columns)
         
         # Identify chart clusters based on criteria
         chart_regions = []
         for cluster in clusters:
-            if self._is_chart_cluster(cluster, page):
-                bbox = self._calculate_cluster_bbox(cluster)
+            bbox = self._calculate_cluster_bbox(candidate_columns, cluster)
+            if self._is_chart_cluster(candidate_columns, cluster, page_width * page_height, bbox):
                 chart_region = {
                     'bbox': bbox,
-                    'shapes': cluster,
+                    'shapes': [shapes[i] for i in candidate_indices[cluster]],
                     'shape_count': len(cluster),
                     'type': 'chart'
                 }
@@ -73,7 +283,7 @@ class ChartDetector:
         
         return chart_regions
     
-    def _filter_candidate_shapes(self, shapes: List[Dict[str, Any]], page: fitz.Page) -> List[Dict[str, Any]]:
+    def _filter_candidate_shapes(self, columns: _ShapeColumns, page_width: float, page_height: float) -> np.ndarray:
         """
         Filter shapes to find potential chart components.
         
@@ -83,101 +293,99 @@ class ChartDetector:
         - Thin lines spanning entire width/height
         
         Args:
-            shapes: List of shape elements
-            page: PyMuPDF page object
+            columns: Shape columns from _shape_columns
+            page_width: Page width in points
+            page_height: Page height in points
             
         Returns:
-            Filtered list of candidate shapes
+            Indices of the candidate shapes
         """
-        candidates = []
-        page_width = page.rect.width
-        page_height = page.rect.height
         page_area = page_width * page_height
         
-        for shape in shapes:
-            width = shape['width']
-            height = shape['height']
-            area = width * height
-            
+        # Evaluate all criteria on the width/height columns at once
+        # instead of branching per shape dict
+        width = columns.width
+        height = columns.height
+        
+        keep = (
             # Skip page backgrounds
-            if area > page_area * 0.5:
-                continue
-            
+            (width * height <= page_area * 0.5) &
             # Skip tiny decorations
             # CRITICAL FIX: Increase minimum size to filter out small decorative elements
             # Small icons, bullets, and decorative circles (< 15pt) should not be chart candidates
             # Real chart elements (pie sectors, bars, etc.) are typically larger
-            if width < 15 or height < 15:
-                continue
-            
+            (width >= 15) & (height >= 15) &
             # Skip full-width thin lines (borders, headers)
-            if height < 15 and width > page_width * 0.9:
-                continue
-            
+            ~((height < 15) & (width > page_width * 0.9)) &
             # Skip full-height thin lines (borders, sidebars)
-            if width < 15 and height > page_height * 0.8:
-                continue
-            
-            candidates.append(shape)
+            ~((width < 15) & (height > page_height * 0.8))
+        )
+        
+        candidates = np.flatnonzero(keep)
         
-        logger.debug(f"Filtered {len(shapes)} shapes to {len(candidates)} candidates")
+        logger.debug(f"Filtered {len(width)} shapes to {len(candidates)} candidates")
         return candidates
     
-    def _cluster_shapes(self, shapes: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    def _cluster_shapes(self, columns: _ShapeColumns) -> List[np.ndarray]:
         """
-        Cluster shapes by spatial proximity using a simple distance-based algorithm.
+        Cluster shapes by spatial proximity.
         Enhanced to detect overlapping shapes (stacked pie charts).
         
+        Shapes outside overlapping groups are grouped by center distance
+        according to cluster_linkage (greedy seeds or connected components).
+        
         Args:
-            shapes: List of shape elements
+            columns: Shape columns from _shape_columns
             
         Returns:
-            List of shape clusters (each cluster is a list of shapes)
+            List of shape clusters, each an array of shape indices
         """
-        if not shapes:
+        count = len(columns.x)
+        if not count:
             return []
         
         # Step 1: Find overlapping shape groups (stacked pie charts)
-        overlapping_clusters = self._find_overlapping_shape_groups(shapes)
+        overlapping_groups = self._find_overlapping_shape_groups(columns)
         
         # Track which shapes are already in overlapping clusters
-        assigned = set()
-        for cluster in overlapping_clusters:
-            for shape in cluster:
-                assigned.add(id(shape))
+        assigned = np.zeros(count, dtype=np.bool_)
+        for group in overlapping_groups:
+            assigned[group] = True
         
         # Step 2: Cluster remaining shapes by spatial proximity
-        clusters = overlapping_clusters[:]
+        clusters = [np.array(group, dtype=np.intp) for group in overlapping_groups]
+        remaining = np.flatnonzero(~assigned)
         
-        for i, shape in enumerate(shapes):
-            if id(shape) in assigned:
-                continue
-            
-            # Start a new cluster
-            cluster = [shape]
-            assigned.add(id(shape))
+        if len(remaining):
+            center_x = (columns.x[remaining] + columns.x2[remaining]) / 2
+            center_y = (columns.y[remaining] + columns.y2[remaining]) / 2
+            threshold_sq = self.cluster_distance_threshold * self.cluster_distance_threshold
             
-            # Find nearby shapes
-            shape_center = self._get_shape_center(shape)
+            # Fast path for the common single-chart page: if every center lies within
+            # the threshold of the first shape, both linkages yield one cluster
+            dx = center_x - center_x[0]
+            dy = center_y - center_y[0]
+            if np.all(dx * dx + dy * dy <= threshold_sq):
+                labels = np.zeros(len(remaining), dtype=np.int32)
+            elif self.cluster_linkage == 'connected':
+                labels = _cluster_by_connectivity(center_x, center_y, threshold_sq)
+            else:
+                labels = _cluster_by_distance(center_x, center_y, threshold_sq)
             
-            for j, other_shape in enumerate(shapes):
-                if id(other_shape) in assigned:
-                    continue
-                
-                other_center = self._get_shape_center(other_shape)
-                distance = self._euclidean_distance(shape_center, other_center)
-                
-                if distance <= self.cluster_distance_threshold:
-                    cluster.append(other_shape)
-                    assigned.add(id(other_shape))
+            # Labels are issued in order of each cluster's first shape, so a stable
+            # sort by label keeps clusters (and their shapes) in original order
+            by_label = remaining[np.argsort(labels, kind='stable')]
+            boundaries = np.cumsum(np.bincount(labels))[:-1]
             
-            if len(cluster) >= self.min_shapes_for_chart:
-                clusters.append(cluster)
+            for cluster in np.split(by_label, boundaries):
+                if len(cluster) >= self.min_shapes_for_chart:
+                    clusters.append(cluster)
         
-        logger.debug(f"Clustered shapes into {len(clusters)} clusters ({len(overlapping_clusters)} overlapping)")
+        logger.debug(f"Clustered shapes into {len(clusters)} clusters ({len(overlapping_groups)} overlapping)")
         return clusters
     
-    def _is_chart_cluster(self, cluster: List[Dict[str, Any]], page: fitz.Page) -> bool:
+    def _is_chart_cluster(self, columns: _ShapeColumns, cluster: np.ndarray, page_area: float,
+                          bbox: Optional[Tuple[float, float, float, float]] = None) -> bool:
         """
         Determine if a cluster represents a chart.
         
@@ -188,8 +396,10 @@ class ChartDetector:
         - Shapes are relatively close together OR completely overlapping
         
         Args:
-            cluster: List of shapes in the cluster
-            page: PyMuPDF page object
+            columns: Shape columns from _shape_columns
+            cluster: Indices of the shapes in the cluster
+            page_area: Page area in points²
+            bbox: Precomputed cluster bbox from _calculate_cluster_bbox, if available
             
         Returns:
             True if cluster is likely a chart
@@ -198,21 +408,18 @@ class ChartDetector:
             return False
         
         # Check color diversity (charts typically use 2+ colors)
-        colors = set()
-        for shape in cluster:
-            fill_color = shape.get('fill_color')
-            if fill_color and fill_color not in ['#FFFFFF', '#000000']:
-                colors.add(fill_color)
+        fill_id = columns.fill_id[cluster]
+        is_colored = (fill_id >= 0) & ~columns.fill_bw[cluster]
+        chart_colors = fill_id[is_colored]
+        has_multiple_colors = len(chart_colors) > 0 and bool((chart_colors != chart_colors[0]).any())
         
         # Charts should have at least 2 distinct colors (excluding black/white)
         # EXCEPTION: Allow single-color clusters if they have large colored shapes (likely pie chart slices)
-        if len(colors) < 2:
+        if not has_multiple_colors:
             # Check if cluster contains large colored shapes (pie chart slices)
-            has_large_colored_shapes = any(
-                shape.get('fill_color') not in ['#FFFFFF', '#000000', None] and
-                shape.get('width', 0) * shape.get('height', 0) > 5000  # Large shape (>5000 pixels²)
-                for shape in cluster
-            )
+            # Large shape (>5000 pixels²)
+            area = columns.width[cluster] * columns.height[cluster]
+            has_large_colored_shapes = bool((is_colored & (area > 5000)).any())
             
             if has_large_colored_shapes:
                 logger.debug(f"Accepting single-color cluster due to large colored shapes (likely pie chart)")
@@ -220,10 +427,11 @@ class ChartDetector:
                 return False
         
         # Check if this is an overlapping cluster (stacked shapes)
-        is_overlapping = self._is_overlapping_cluster(cluster)
+        is_overlapping = self._is_overlapping_cluster(columns, cluster)
         
         # Check cluster area
-        bbox = self._calculate_cluster_bbox(cluster)
+        if bbox is None:
+            bbox = self._calculate_cluster_bbox(columns, cluster)
         cluster_width = bbox[2] - bbox[0]
         cluster_height = bbox[3] - bbox[1]
         cluster_area = cluster_width * cluster_height
@@ -241,21 +449,21 @@ class ChartDetector:
                 return False
         
         # Too large (likely not a compact chart)
-        page_area = page.rect.width * page.rect.height
         if cluster_area > page_area * 0.4:
             return False
         
         cluster_type = "overlapping" if is_overlapping else "scattered"
         logger.debug(f"Chart cluster validated ({cluster_type}): {len(cluster)} shapes, "
-                    f"{len(colors)} colors, area={cluster_area:.0f}")
+                    f"{'multiple' if has_multiple_colors else 'single'} color(s), area={cluster_area:.0f}")
         return True
     
-    def _is_overlapping_cluster(self, cluster: List[Dict[str, Any]]) -> bool:
+    def _is_overlapping_cluster(self, columns: _ShapeColumns, cluster: np.ndarray) -> bool:
         """
         Check if a cluster consists of overlapping shapes.
         
         Args:
-            cluster: List of shapes
+            columns: Shape columns from _shape_columns
+            cluster: Indices of the shapes in the cluster
             
         Returns:
             True if shapes are overlapping (same position and size)
@@ -263,38 +471,36 @@ class ChartDetector:
         if len(cluster) < 2:
             return False
         
-        # Get position of first shape
-        first_shape = cluster[0]
-        ref_pos = (first_shape['x'], first_shape['y'], 
-                  first_shape['width'], first_shape['height'])
-        
-        # Check if all other shapes are in nearly the same position
-        overlapping_count = 1
-        for shape in cluster[1:]:
-            pos = (shape['x'], shape['y'], shape['width'], shape['height'])
-            if self._are_positions_nearly_identical(ref_pos, pos, tolerance=5.0):
-                overlapping_count += 1
+        # Check if all shapes are in nearly the same position as the first one
+        # (the first shape always matches itself)
+        ref = cluster[0]
+        tolerance = 5.0
+        nearly_identical = np.ones(len(cluster), dtype=np.bool_)
+        for column in (columns.x, columns.y, columns.width, columns.height):
+            nearly_identical &= np.abs(column[cluster] - column[ref]) <= tolerance
+        overlapping_count = np.count_nonzero(nearly_identical)
         
         # If most shapes are overlapping, consider it an overlapping cluster
         return overlapping_count >= len(cluster) * 0.7  # 70% threshold
     
-    def _calculate_cluster_bbox(self, cluster: List[Dict[str, Any]]) -> Tuple[float, float, float, float]:
+    def _calculate_cluster_bbox(self, columns: _ShapeColumns, cluster: np.ndarray) -> Tuple[float, float, float, float]:
         """
         Calculate the bounding box of a shape cluster.
         
         Args:
-            cluster: List of shapes
+            columns: Shape columns from _shape_columns
+            cluster: Indices of the shapes in the cluster
             
         Returns:
             Tuple (x0, y0, x1, y1)
         """
-        if not cluster:
+        if not len(cluster):
             return (0, 0, 0, 0)
         
-        x0 = min(shape['x'] for shape in cluster)
-        y0 = min(shape['y'] for shape in cluster)
-        x1 = max(shape['x2'] for shape in cluster)
-        y1 = max(shape['y2'] for shape in cluster)
+        x0 = float(columns.x[cluster].min())
+        y0 = float(columns.y[cluster].min())
+        x1 = float(columns.x2[cluster].max())
+        y1 = float(columns.y2[cluster].max())
         
         # Add minimal padding (2% on each side) to avoid capturing surrounding content
         # Previous 5% was too large and would capture nearby text/shapes
@@ -308,67 +514,63 @@ class ChartDetector:
             y1 + padding_y
         )
     
-    def _get_shape_center(self, shape: Dict[str, Any]) -> Tuple[float, float]:
-        """Get the center point of a shape."""
-        return (
-            (shape['x'] + shape['x2']) / 2,
-            (shape['y'] + shape['y2']) / 2
-        )
-    
-    def _euclidean_distance(self, point1: Tuple[float, float], point2: Tuple[float, float]) -> float:
-        """Calculate Euclidean distance between two points."""
-        return ((point1[0] - point2[0]) ** 2 + (point1[1] - point2[1]) ** 2) ** 0.5
-    
-    def _find_overlapping_shape_groups(self, shapes: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    def _find_overlapping_shape_groups(self, columns: _ShapeColumns) -> List[List[int]]:
         """
         Find groups of shapes that are completely overlapping (stacked).
         This detects cases like pie charts made from stacked colored rectangles.
         
         Args:
-            shapes: List of shape elements
+            columns: Shape columns from _shape_columns
             
         Returns:
-            List of overlapping shape groups
+            List of overlapping shape groups, as lists of shape indices
         """
+        tolerance = 5.0
         groups = []
         used_indices = set()
         
-        for i, shape1 in enumerate(shapes):
+        positions = list(zip(columns.x.tolist(), columns.y.tolist(),
+                             columns.width.tolist(), columns.height.tolist()))
+        colors = columns.fill_id.tolist()
+        
+        # Skip shapes with no fill color (or a black/white fill)
+        colored = np.flatnonzero((columns.fill_id >= 0) & ~columns.fill_bw)
+        
+        # Sort colored shapes by x and sweep: only shapes whose x lies within the
+        # tolerance window can match, so each shape is compared against that
+        # slice instead of every other shape on the page. The window is padded
+        # slightly so float rounding never drops a pair the exact check accepts.
+        by_x = colored[np.argsort(columns.x[colored], kind='stable')].tolist()
+        sorted_x = columns.x[by_x].tolist()
+        window = tolerance + 1e-6
+        
+        for i in colored.tolist():
             if i in used_indices:
                 continue
             
-            group = [shape1]
-            pos1 = (shape1['x'], shape1['y'], shape1['width'], shape1['height'])
-            color1 = shape1.get('fill_color')
+            group = [i]
+            pos1 = positions[i]
+            color1 = colors[i]
             
-            # Skip if this shape has no fill color
-            if not color1 or color1 in ['#FFFFFF', '#000000']:
-                continue
+            lo = bisect_left(sorted_x, pos1[0] - window)
+            hi = bisect_right(sorted_x, pos1[0] + window)
+            candidates = sorted(j for j in by_x[lo:hi] if j > i and j not in used_indices)
             
-            for j, shape2 in enumerate(shapes):
-                if j <= i or j in used_indices:
-                    continue
-                
-                pos2 = (shape2['x'], shape2['y'], shape2['width'], shape2['height'])
-                color2 = shape2.get('fill_color')
-                
-                # Skip if shape2 has no fill color
-                if not color2 or color2 in ['#FFFFFF', '#000000']:
-                    continue
-                
+            for j in candidates:
                 # Check if positions are nearly identical (tolerance: 5pt)
-                if self._are_positions_nearly_identical(pos1, pos2, tolerance=5.0):
+                if self._are_positions_nearly_identical(pos1, positions[j], tolerance=tolerance):
                     # Check if colors are different
-                    if color1 != color2:
-                        group.append(shape2)
+                    if color1 != colors[j]:
+                        group.append(j)
                         used_indices.add(j)
             
             # A valid overlapping group needs at least 2 shapes with different colors
             if len(group) >= 2:
                 groups.append(group)
                 used_indices.add(i)
+                x, y, width, height = pos1
                 logger.info(f"Found overlapping shape group: {len(group)} shapes at "
-                          f"({shape1['x']:.1f}, {shape1['y']:.1f}), size {shape1['width']:.1f}x{shape1['height']:.1f}")
+                          f"({x:.1f}, {y:.1f}), size {width:.1f}x{height:.1f}")
         
         return groups
     
@@ -439,31 +641,109 @@ class ChartDetector:
         
         return filtered
     
-    def render_chart_as_image(self, page: fitz.Page, bbox: Tuple[float, float, float, float]) -> bytes:
+    def render_chart_as_image(self, page: fitz.Page, bbox: Tuple[float, float, float, float],
+                              fmt: str = 'png') -> Union[bytes, Tuple[bytes, int, int, int]]:
         """
         Render a chart region as a high-resolution PNG image.
         
+        Only the clipped region is rasterized, directly in RGB, and the zoom is
+        capped so the longer side does not exceed chart_max_render_px.
+        
         Args:
             page: PyMuPDF page object
             bbox: Bounding box (x0, y0, x1, y1) of the chart region
+            fmt: 'png' for encoded PNG bytes, or 'raw' to skip PNG encoding
             
         Returns:
-            PNG image data as bytes
+            PNG image data as bytes, or for fmt='raw' a tuple of
+            (RGB samples, width, height, components)
         """
+        if fmt == 'png':
+            cache_key = self._png_cache_key(page, bbox)
+            png_data = self._get_cached_png(cache_key)
+            if png_data is not None:
+                return png_data
+        
         # Create clipping rectangle
         clip_rect = fitz.Rect(bbox)
         
         # Calculate zoom matrix for high-resolution rendering
         # DPI = 72 * zoom, so zoom = DPI / 72
         zoom = self.chart_render_dpi / 72.0
+        longest_side = max(clip_rect.width, clip_rect.height)
+        if longest_side > 0:
+            zoom = min(zoom, self.chart_max_render_px / longest_side)
         matrix = fitz.Matrix(zoom, zoom)
         
         # Render the region
-        pixmap = page.get_pixmap(matrix=matrix, clip=clip_rect, alpha=False)
+        pixmap = page.get_pixmap(matrix=matrix, clip=clip_rect, colorspace=fitz.csRGB, alpha=False)
+        
+        logger.info(f"Rendered chart region: {pixmap.width}x{pixmap.height}px at {zoom * 72:.0f} DPI")
+        
+        if fmt == 'raw':
+            return pixmap.samples, pixmap.width, pixmap.height, pixmap.n
         
         # Convert to PNG bytes
         png_data = pixmap.tobytes("png")
+        self._store_cached_png(cache_key, png_data)
+        return png_data
+    
+    def render_charts_as_images(self, page: fitz.Page,
+                                bboxes: List[Tuple[float, float, float, float]]) -> List[bytes]:
+        """
+        Render several chart regions of a page as PNG images.
         
-        logger.info(f"Rendered chart region: {pixmap.width}x{pixmap.height}px at {self.chart_render_dpi} DPI")
+        MuPDF is not thread-safe, so the regions are rasterized one after
+        another; PNG encoding (which releases the GIL in Pillow) is then
+        spread over a thread pool when there is more than one chart.
         
+        Args:
+            page: PyMuPDF page object
+            bboxes: Bounding boxes (x0, y0, x1, y1) of the chart regions
+            
+        Returns:
+            PNG image data for each bbox, in the same order
+        """
+        cache_keys = [self._png_cache_key(page, bbox) for bbox in bboxes]
+        images = [self._get_cached_png(cache_key) for cache_key in cache_keys]
+        missing = [i for i, png_data in enumerate(images) if png_data is None]
+        
+        rasters = [self.render_chart_as_image(page, bboxes[i], fmt='raw') for i in missing]
+        
+        if len(rasters) <= 1:
+            encoded = [_encode_png(raster) for raster in rasters]
+        else:
+            max_workers = min(len(rasters), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                encoded = list(executor.map(_encode_png, rasters))
+        
+        for i, png_data in zip(missing, encoded):
+            images[i] = png_data
+            self._store_cached_png(cache_keys[i], png_data)
+        
+        return images
+    
+    def clear_render_cache(self):
+        """Drop all cached chart PNGs (call when the document is closed)."""
+        self._png_cache.clear()
+    
+    def _png_cache_key(self, page: fitz.Page,
+                       bbox: Tuple[float, float, float, float]) -> Tuple[int, Tuple[float, ...], int]:
+        """Build the render cache key for a chart region of a page."""
+        return page.number, tuple(round(v, 1) for v in bbox), self.chart_render_dpi
+    
+    def _get_cached_png(self, cache_key: Tuple[int, Tuple[float, ...], int]) -> Optional[bytes]:
+        """Return a cached PNG and mark it as recently used, or None."""
+        png_data = self._png_cache.get(cache_key)
+        if png_data is not None:
+            self._png_cache.move_to_end(cache_key)
         return png_data
+    
+    def _store_cached_png(self, cache_key: Tuple[int, Tuple[float, ...], int], png_data: bytes):
+        """Cache a rendered PNG, evicting the least recently used entries."""
+        if self.chart_png_cache_size <= 0:
+            return
+        self._png_cache[cache_key] = png_data
+        self._png_cache.move_to_end(cache_key)
+        while len(self._png_cache) > self.chart_png_cache_size:
+            self._png_cache.popitem(last=False)
@@ -3,10 +3,42 @@ Element Extractor - Helper class for extracting specific types of elements
 """
 
 import logging
+import math
+from operator import itemgetter
 from typing import List, Dict, Any
 
 logger = logging.getLogger(__name__)
 
+# Open bounds in the filters, so one chained compare covers every case
+_NEG_INF = -math.inf
+_POS_INF = math.inf
+_OPEN_RANGE = (_NEG_INF, _POS_INF)
+
+# Element types bucketed by bucket_by_type
+_BUCKET_TYPES = ('text', 'image', 'shape', 'table')
+
+
+def _column(elements: List[Dict[str, Any]], key: str, default: Any = 0) -> List[Any]:
+    """
+    Read one key from every element.
+    
+    Parser elements always carry their position keys, so the values are
+    read with a C-level itemgetter; only lists with a missing key fall
+    back to dict.get with the default.
+    """
+    try:
+        return list(map(itemgetter(key), elements))
+    except KeyError:
+        return [e.get(key, default) for e in elements]
+
+
+def _end_column(elements: List[Dict[str, Any]], xs: List[float]) -> List[float]:
+    """Read x2 from every element, defaulting to the element's own x."""
+    try:
+        return list(map(itemgetter('x2'), elements))
+    except KeyError:
+        return [e.get('x2', x) for e, x in zip(elements, xs)]
+
 
 class ElementExtractor:
     """
@@ -14,19 +46,43 @@ class ElementExtractor:
     """
     
     @staticmethod
-    def get_text_elements(page_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def bucket_by_type(page_data: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Split page elements by type in a single pass.
+        
+        Args:
+            page_data: Page data from PDF parser
+            
+        Returns:
+            Dictionary with 'text', 'image', 'shape' and 'table' element lists,
+            each in page order; elements of other types are skipped
+        """
+        elements = page_data.get('elements') or ()
+        
+        buckets = {elem_type: [] for elem_type in _BUCKET_TYPES}
+        append_to = {elem_type: bucket.append for elem_type, bucket in buckets.items()}
+        
+        for elem in elements:
+            append = append_to.get(elem['type'])
+            if append is not None:
+                append(elem)
+        
+        return buckets
+    
+    @classmethod
+    def get_text_elements(cls, page_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Extract only text elements from page data."""
-        return [elem for elem in page_data.get('elements', []) if elem['type'] == 'text']
+        return cls.bucket_by_type(page_data)['text']
     
-    @staticmethod
-    def get_image_elements(page_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    @classmethod
+    def get_image_elements(cls, page_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Extract only image elements from page data."""
-        return [elem for elem in page_data.get('elements', []) if elem['type'] == 'image']
+        return cls.bucket_by_type(page_data)['image']
     
-    @staticmethod
-    def get_shape_elements(page_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    @classmethod
+    def get_shape_elements(cls, page_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Extract only shape/drawing elements from page data."""
-        return [elem for elem in page_data.get('elements', []) if elem['type'] == 'shape']
+        return cls.bucket_by_type(page_data)['shape']
     
     @staticmethod
     def filter_by_size(elements: List[Dict[str, Any]], min_size: float = None, 
@@ -42,15 +98,16 @@ class ElementExtractor:
         Returns:
             Filtered list of elements
         """
-        filtered = elements
-        
-        if min_size is not None:
-            filtered = [e for e in filtered if e.get('font_size', 0) >= min_size]
+        if min_size is None and max_size is None:
+            return elements
         
-        if max_size is not None:
-            filtered = [e for e in filtered if e.get('font_size', 999) <= max_size]
+        # Both bounds in one pass; open bounds become infinities. Elements without
+        # a font size keep their historical defaults (0 for min, 999 for max).
+        lo = _NEG_INF if min_size is None else min_size
+        hi = _POS_INF if max_size is None else max_size
         
-        return filtered
+        return [e for e in elements
+                if lo <= e.get('font_size', 0) and e.get('font_size', 999) <= hi]
     
     @staticmethod
     def filter_by_position(elements: List[Dict[str, Any]], 
@@ -67,17 +124,15 @@ class ElementExtractor:
         Returns:
             Filtered list of elements
         """
-        filtered = elements
+        if x_range is None and y_range is None:
+            return elements
         
-        if x_range is not None:
-            min_x, max_x = x_range
-            filtered = [e for e in filtered if min_x <= e.get('x', 0) <= max_x]
+        # Both ranges in one pass; an open range becomes (-inf, inf)
+        min_x, max_x = _OPEN_RANGE if x_range is None else x_range
+        min_y, max_y = _OPEN_RANGE if y_range is None else y_range
         
-        if y_range is not None:
-            min_y, max_y = y_range
-            filtered = [e for e in filtered if min_y <= e.get('y', 0) <= max_y]
-        
-        return filtered
+        return [e for e in elements
+                if min_x <= e.get('x', 0) <= max_x and min_y <= e.get('y', 0) <= max_y]
     
     @staticmethod
     def sort_by_position(elements: List[Dict[str, Any]], 
@@ -93,13 +148,18 @@ class ElementExtractor:
             Sorted list of elements
         """
         if sort_by == 'y':
-            return sorted(elements, key=lambda e: (e.get('y', 0), e.get('x', 0)))
-        elif sort_by == 'x':
-            return sorted(elements, key=lambda e: (e.get('x', 0), e.get('y', 0)))
-        elif sort_by == 'xy':
-            return sorted(elements, key=lambda e: (e.get('x', 0), e.get('y', 0)))
+            primary, secondary = 'y', 'x'
+        elif sort_by in ('x', 'xy'):
+            primary, secondary = 'x', 'y'
+        else:
+            return elements
         
-        return elements
+        try:
+            # Parser elements always carry x/y, so the C-level itemgetter applies
+            return sorted(elements, key=itemgetter(primary, secondary))
+        except KeyError:
+            keys = [(e.get(primary, 0), e.get(secondary, 0)) for e in elements]
+            return [elements[i] for i in sorted(range(len(elements)), key=keys.__getitem__)]
     
     @staticmethod
     def group_by_line(elements: List[Dict[str, Any]], 
@@ -117,30 +177,32 @@ class ElementExtractor:
         if not elements:
             return []
         
-        # Sort by y position first
-        sorted_elements = sorted(elements, key=lambda e: e.get('y', 0))
+        # Read each position once, then work on indices sorted by y
+        ys = _column(elements, 'y')
+        xs = _column(elements, 'x')
+        order = sorted(range(len(elements)), key=ys.__getitem__)
         
-        lines = []
-        current_line = [sorted_elements[0]]
-        current_y = sorted_elements[0].get('y', 0)
+        line_indices = []
+        current_line = [order[0]]
+        current_y = ys[order[0]]
         
-        for elem in sorted_elements[1:]:
-            elem_y = elem.get('y', 0)
+        for i in order[1:]:
+            elem_y = ys[i]
             
             if abs(elem_y - current_y) <= tolerance:
                 # Same line
-                current_line.append(elem)
+                current_line.append(i)
             else:
                 # New line
-                lines.append(sorted(current_line, key=lambda e: e.get('x', 0)))
-                current_line = [elem]
+                line_indices.append(current_line)
+                current_line = [i]
                 current_y = elem_y
         
-        # Add last line
-        if current_line:
-            lines.append(sorted(current_line, key=lambda e: e.get('x', 0)))
+        # Add last line (never empty: it starts with an element)
+        line_indices.append(current_line)
         
-        return lines
+        # Order each line by x
+        return [[elements[i] for i in sorted(line, key=xs.__getitem__)] for line in line_indices]
     
     @staticmethod
     def group_close_elements(line_elements: List[Dict[str, Any]], 
@@ -159,30 +221,30 @@ class ElementExtractor:
         if not line_elements:
             return []
         
-        # Sort by x position
-        sorted_elements = sorted(line_elements, key=lambda e: e.get('x', 0))
+        # Sort by x position, reading x and x2 (default: x) once per element
+        xs = _column(line_elements, 'x')
+        order = sorted(range(len(line_elements)), key=xs.__getitem__)
+        sorted_elements = [line_elements[i] for i in order]
+        xs = [xs[i] for i in order]
+        x2s = _end_column(sorted_elements, xs)
         
         groups = []
         current_group = [sorted_elements[0]]
-        prev_x2 = sorted_elements[0].get('x2', sorted_elements[0].get('x', 0))
+        prev_x2 = x2s[0]
         
-        for elem in sorted_elements[1:]:
-            x = elem.get('x', 0)
-            gap = x - prev_x2
-            
+        for i in range(1, len(sorted_elements)):
             # If gap is very small (≤ tolerance), they should be in same textbox
-            if gap <= gap_tolerance:
-                current_group.append(elem)
+            if xs[i] - prev_x2 <= gap_tolerance:
+                current_group.append(sorted_elements[i])
             else:
                 # Gap is large enough, start new group
                 groups.append(current_group)
-                current_group = [elem]
+                current_group = [sorted_elements[i]]
             
-            prev_x2 = elem.get('x2', elem.get('x', 0))
+            prev_x2 = x2s[i]
         
-        # Add last group
-        if current_group:
-            groups.append(current_group)
+        # Add last group (never empty: it starts with an element)
+        groups.append(current_group)
         
         return groups
     
@@ -200,24 +262,23 @@ class ElementExtractor:
         if not line_elements:
             return ""
         
-        # Sort by x position
-        sorted_elements = sorted(line_elements, key=lambda e: e.get('x', 0))
+        # Sort by x position, reading x once per element
+        xs = _column(line_elements, 'x')
+        x2s = _end_column(line_elements, xs)
+        contents = _column(line_elements, 'content', '')
+        order = sorted(range(len(line_elements)), key=xs.__getitem__)
         
         # Merge with appropriate spacing
-        text_parts = []
-        prev_x2 = None
+        text_parts = [contents[order[0]]]
+        append = text_parts.append
+        prev_x2 = x2s[order[0]]
         
-        for elem in sorted_elements:
-            text = elem.get('content', '')
-            x = elem.get('x', 0)
-            
-            if prev_x2 is not None:
-                gap = x - prev_x2
-                # If gap is significant, add space
-                if gap > 5:
-                    text_parts.append(' ')
+        for i in order[1:]:
+            # If gap is significant, add space
+            if xs[i] - prev_x2 > 5:
+                append(' ')
             
-            text_parts.append(text)
-            prev_x2 = elem.get('x2', x)
+            append(contents[i])
+            prev_x2 = x2s[i]
         
         return ''.join(text_parts)
@@ -1,15 +1,449 @@
 """
 Gradient Detector - Detects gradient patterns that need to be rendered as images
+
+The work splits into two halves with different performance profiles:
+
+- _DrawingScanner is memory-bound: it walks the drawing dicts and their
+  fitz.Rect objects (pointer chasing through Python objects), so it is
+  optimized by touching each drawing as few times as possible (sorted
+  center index, single-pass region scans).
+- _GradientRenderer is compute-bound: MuPDF rasterization and PNG
+  encoding, so it is optimized by caching per-page MuPDF work (display
+  lists, image placements, XObject lookups).
+
+GradientDetector ties the two together and owns the gradient-based
+filtering of texts and shapes.
 """
 
 import fitz  # PyMuPDF
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import re
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
 from PIL import Image
 import io
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Page number in "N/M" format (e.g., "3/10")
+_N_SLASH_M_RE = re.compile(r'^\d+/\d+$')
+
+
+class _RegionScan(NamedTuple):
+    """Summary of the drawings assigned to a header/footer region."""
+    drawing_count: int  # Drawings whose center lies in the region
+    total_items: int  # Path items across those drawings (counted until is_complex)
+    complex_count: int  # Drawings with more than 50 path items (counted until is_complex)
+    is_complex: bool  # Enough items or complex shapes to be a gradient candidate
+    inside_drawings: List[Dict[str, Any]]  # Those whose rect lies fully within the region's y-range
+
+
+def _reduce_bbox(coords: np.ndarray) -> Tuple[float, float, float, float]:
+    """
+    Reduce an (N, 4) array of rect corners to their union bbox.
+    
+    Only the columns that contribute are reduced: minimum over x0/y0 and
+    maximum over x1/y1.
+    
+    Args:
+        coords: float64 array of shape (N, 4) with N >= 1
+        
+    Returns:
+        Tuple of (x0, y0, x1, y1)
+    """
+    x0, y0 = coords[:, :2].min(axis=0).tolist()
+    x1, y1 = coords[:, 2:].max(axis=0).tolist()
+    return (x0, y0, x1, y1)
+
+
+class _DrawingScanner:
+    """
+    Drawing traversal for gradient detection (memory-bound half).
+    
+    Assigns drawings to the header/footer regions and summarizes them;
+    everything here reads drawing dicts and rects, nothing is rendered.
+    """
+    
+    @staticmethod
+    def sorted_drawing_centers(drawings: List[Dict[str, Any]]) -> Tuple[List[float], List[int]]:
+        """
+        Sort drawings by the y coordinate of their center.
+        
+        Args:
+            drawings: All drawings of the page
+            
+        Returns:
+            Tuple of (ascending center ys, matching indices into drawings);
+            drawings without a rect are left out
+        """
+        keyed = sorted(
+            ((rect.y0 + rect.y1) / 2, i)
+            for i, rect in enumerate(drawing.get("rect") for drawing in drawings)
+            if rect
+        )
+        
+        centers = [center for center, _ in keyed]
+        order = [i for _, i in keyed]
+        return centers, order
+    
+    @staticmethod
+    def region_candidates(
+        drawings: List[Dict[str, Any]],
+        header_bottom: float,
+        footer_top: float
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Select the drawings whose center y lies in the header or footer band.
+        
+        Args:
+            drawings: All drawings of the page
+            header_bottom: Header drawings have their center above this y
+            footer_top: Footer drawings have their center below this y
+            
+        Returns:
+            Tuple of (header candidates, footer candidates), each in page order
+        """
+        # Sort the centers once and bisect each region's candidates
+        # instead of rescanning every drawing
+        centers, order = _DrawingScanner.sorted_drawing_centers(drawings)
+        header_candidates = [drawings[i] for i in sorted(order[:bisect_left(centers, header_bottom)])]
+        footer_candidates = [drawings[i] for i in sorted(order[bisect_right(centers, footer_top):])]
+        
+        return header_candidates, footer_candidates
+    
+    @staticmethod
+    def scan_region(
+        drawings: List[Dict[str, Any]],
+        center_above: float,
+        center_below: float,
+        region_rect: fitz.Rect,
+        min_complex_items: int
+    ) -> _RegionScan:
+        """
+        Summarize the drawings of one region in a single pass.
+        
+        Counts path items and complex shapes, and collects the drawings lying
+        fully within the region's vertical bounds, for every drawing whose
+        center y satisfies center_above < y < center_below. Both counts only
+        grow, so item counting stops once the gradient criteria are met.
+        
+        Args:
+            drawings: All drawings of the page
+            center_above: Exclusive lower bound on the drawing's center y
+            center_below: Exclusive upper bound on the drawing's center y
+            region_rect: Rectangle defining the region
+            min_complex_items: Total path items above which the region is complex
+            
+        Returns:
+            _RegionScan for the region
+        """
+        region_y0 = region_rect.y0
+        region_y1 = region_rect.y1
+        
+        drawing_count = 0
+        total_items = 0
+        complex_count = 0
+        is_complex = False
+        inside_drawings = []
+        
+        for drawing in drawings:
+            rect = drawing.get("rect")
+            if not rect:
+                continue
+            
+            y0 = rect.y0
+            y1 = rect.y1
+            if not (center_above < (y0 + y1) / 2 < center_below):
+                continue
+            
+            drawing_count += 1
+            
+            if not is_complex:
+                item_count = len(drawing.get("items") or ())
+                total_items += item_count
+                
+                # Consider shapes with many items as "complex"
+                if item_count > 50:
+                    complex_count += 1
+                
+                # Criteria: Either many total items OR multiple complex shapes
+                is_complex = total_items > min_complex_items or complex_count >= 2
+            
+            # Only shapes actually within the region bounds count towards its bbox
+            if y0 >= region_y0 and y1 <= region_y1:
+                inside_drawings.append(drawing)
+        
+        return _RegionScan(drawing_count, total_items, complex_count, is_complex, inside_drawings)
+    
+    @staticmethod
+    def calculate_actual_bbox(drawings: List[Dict[str, Any]]) -> Optional[Tuple[float, float, float, float]]:
+        """
+        Calculate the actual bounding box of a list of drawings.
+        
+        This is critical for avoiding blank space in rendered gradient images.
+        Instead of rendering the entire region (e.g., bottom 10% of page),
+        we calculate the tight bounding box of the actual vector shapes.
+        
+        Args:
+            drawings: List of drawing dictionaries
+            
+        Returns:
+            Tuple of (x0, y0, x1, y1) or None if no valid drawings
+        """
+        if not drawings:
+            return None
+        
+        # Gather all rect corners into one (N, 4) array and reduce per column
+        coords = np.fromiter(
+            chain.from_iterable([drawing["rect"] for drawing in drawings if drawing.get("rect")]),
+            dtype=np.float64
+        ).reshape(-1, 4)
+        
+        if not len(coords):
+            return None
+        
+        return _reduce_bbox(coords)
+
+
+class _GradientRenderer:
+    """
+    Image production for gradient regions (compute-bound half).
+    
+    Extracts embedded gradient XObjects, rasterizes vector gradients and
+    samples pixels. MuPDF work is cached per page; call reset_cache when
+    moving to a new page or document.
+    """
+    
+    def __init__(self, render_dpi: float):
+        """
+        Initialize the renderer.
+        
+        Args:
+            render_dpi: Zoom factor for vector gradient rendering
+        """
+        self._render_matrix = fitz.Matrix(render_dpi, render_dpi)
+        # Image placements per page number: [(xref, rect), ...] in get_images order
+        self._image_rects_cache: Dict[int, List[Tuple[int, fitz.Rect]]] = {}
+        # XObject lookups per (page number, region bounds), including misses (None)
+        self._xobject_result_cache: Dict[tuple, Optional[Dict[str, Any]]] = {}
+        # Display list of the last rendered page: (page number, fitz.DisplayList)
+        self._display_list: Optional[Tuple[int, fitz.DisplayList]] = None
+    
+    def reset_cache(self):
+        """Drop all per-page caches."""
+        self._image_rects_cache.clear()
+        self._xobject_result_cache.clear()
+        self._display_list = None
+    
+    def _get_page_display_list(self, page: fitz.Page) -> fitz.DisplayList:
+        """
+        Get the display list of a page, reusing it for further renders of the same page.
+        
+        page.get_pixmap interprets the whole page into a new display list on
+        every call; header and footer renders of one page can share it.
+        Only the most recent page is kept, since display lists of
+        drawing-heavy pages are large.
+        
+        Args:
+            page: PyMuPDF page object
+            
+        Returns:
+            Display list of the page (annotations included, as get_pixmap does)
+        """
+        if self._display_list is None or self._display_list[0] != page.number:
+            self._display_list = (page.number, page.get_displaylist(annots=True))
+        return self._display_list[1]
+    
+    def _get_page_image_rects(self, page: fitz.Page) -> List[Tuple[int, fitz.Rect]]:
+        """
+        Get every image placement on a page, cached per page.
+        
+        Header and footer detection both scan the page's images, so the
+        MuPDF resource lookups run once per page instead of once per region.
+        
+        Args:
+            page: PyMuPDF page object
+            
+        Returns:
+            List of (xref, rect) for each occurrence of each image
+        """
+        image_rects = self._image_rects_cache.get(page.number)
+        if image_rects is None:
+            image_rects = [
+                (img_info[0], img_rect)
+                for img_info in page.get_images(full=True)
+                for img_rect in page.get_image_rects(img_info[0])
+            ]
+            self._image_rects_cache[page.number] = image_rects
+        return image_rects
+    
+    def render_region(self, page: fitz.Page, clip: fitz.Rect) -> Tuple[bytes, int, int]:
+        """
+        Render a region of a page as PNG at the gradient render zoom.
+        
+        Args:
+            page: PyMuPDF page object
+            clip: Region to render
+            
+        Returns:
+            Tuple of (PNG data, width in pixels, height in pixels)
+        """
+        pix = self._get_page_display_list(page).get_pixmap(
+            matrix=self._render_matrix, colorspace=fitz.csRGB, alpha=True, clip=clip
+        )
+        
+        # The pixmap already knows its size; no need to re-open the PNG
+        return pix.tobytes("png"), pix.width, pix.height
+    
+    def find_gradient_xobject_in_region(
+        self,
+        page: fitz.Page,
+        region_rect: fitz.Rect,
+        page_num: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find the gradient XObject in a region, memoized per page and region.
+        
+        Misses are cached too, since most regions have no embedded image.
+        Hits return a fresh copy because callers annotate the result.
+        
+        Args:
+            page: PyMuPDF page object
+            region_rect: Rectangle defining the region to search
+            page_num: Page number for logging
+            
+        Returns:
+            Image element dictionary if gradient XObject found, None otherwise
+        """
+        key = (page.number, region_rect.x0, region_rect.y0, region_rect.x1, region_rect.y1)
+        if key in self._xobject_result_cache:
+            result = self._xobject_result_cache[key]
+        else:
+            result = self._scan_gradient_xobject_in_region(page, region_rect, page_num)
+            self._xobject_result_cache[key] = result
+        return dict(result) if result is not None else None
+    
+    def _scan_gradient_xobject_in_region(
+        self,
+        page: fitz.Page,
+        region_rect: fitz.Rect,
+        page_num: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find the original embedded image XObject that represents the gradient pattern in a region.
+        
+        This is the CORRECT way to extract gradient patterns:
+        - Look for embedded images (XObjects) in the region
+        - Extract the original image data directly
+        - Preserve the exact size and position from the PDF
+        
+        Args:
+            page: PyMuPDF page object
+            region_rect: Rectangle defining the region to search
+            page_num: Page number for logging
+            
+        Returns:
+            Image element dictionary if gradient XObject found, None otherwise
+        """
+        try:
+            # Get all image placements on the page (cached across regions)
+            image_rects = self._get_page_image_rects(page)
+            
+            if not image_rects:
+                logger.debug(f"Page {page_num}: No images found on page")
+                return None
+            
+            # Look for images that overlap with the region
+            # We use overlap ratio instead of just center point to be more flexible
+            best_match = None
+            best_overlap_ratio = 0.0
+            
+            region_x0, region_y0, region_x1, region_y1 = region_rect
+            
+            # Per-image logging is the hot path on image-heavy pages: check the level once
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
+            
+            # Check each occurrence of each image
+            for xref, img_rect in image_rects:
+                img_x0, img_y0, img_x1, img_y1 = img_rect
+                
+                img_area = (img_x1 - img_x0) * (img_y1 - img_y0)
+                if img_area <= 0:
+                    continue
+                
+                # Calculate overlap with region
+                # Overlap = intersection area / image area
+                x_overlap = min(img_x1, region_x1) - max(img_x0, region_x0)
+                y_overlap = min(img_y1, region_y1) - max(img_y0, region_y0)
+                if x_overlap <= 0 or y_overlap <= 0:
+                    continue  # No overlap: can be neither logged nor the best match
+                
+                overlap_ratio = (x_overlap * y_overlap) / img_area
+                
+                # Log all images in region for debugging
+                if debug_enabled and overlap_ratio > 0.1:
+                    logger.debug("Page %s: Found image xref=%s with %.1f%% overlap, "
+                                 "position: (%.1f, %.1f), size: %.1fx%.1fpt",
+                                 page_num, xref, overlap_ratio * 100,
+                                 img_x0, img_y0, img_rect.width, img_rect.height)
+                
+                # Keep track of the best match (highest overlap ratio)
+                # Require at least 50% overlap to consider it part of the region
+                if overlap_ratio > best_overlap_ratio and overlap_ratio >= 0.5:
+                    best_overlap_ratio = overlap_ratio
+                    best_match = (xref, img_rect)
+            
+            # If we found a good match, extract it
+            if best_match:
+                xref, img_rect = best_match
+                
+                # Extract the image
+                base_image = page.parent.extract_image(xref)
+                
+                if not base_image:
+                    logger.warning(f"Page {page_num}: Failed to extract image xref={xref}")
+                    return None
+                
+                image_bytes = base_image["image"]
+                image_ext = base_image["ext"]
+                
+                # extract_image already reports the pixel size; only open the
+                # image (header only, no pixel decode) if it is missing
+                width_px = base_image.get("width")
+                height_px = base_image.get("height")
+                if not (width_px and height_px):
+                    width_px, height_px = Image.open(io.BytesIO(image_bytes)).size
+                
+                logger.info(f"Page {page_num}: Found gradient XObject in region (overlap={best_overlap_ratio*100:.1f}%), "
+                          f"original size: {width_px}x{height_px}px, "
+                          f"position: ({img_rect.x0:.1f}, {img_rect.y0:.1f}), "
+                          f"PDF size: {img_rect.width:.1f}x{img_rect.height:.1f}pt")
+                
+                # Return the image element using original XObject data
+                return {
+                    'type': 'image',
+                    'image_data': image_bytes,
+                    'image_format': image_ext,
+                    'width_px': width_px,
+                    'height_px': height_px,
+                    'x': img_rect.x0,
+                    'y': img_rect.y0,
+                    'x2': img_rect.x1,
+                    'y2': img_rect.y1,
+                    'width': img_rect.width,
+                    'height': img_rect.height,
+                }
+            
+            logger.debug(f"Page {page_num}: No suitable gradient XObject found in region "
+                        f"(best overlap: {best_overlap_ratio*100:.1f}%)")
+            return None
+            
+        except Exception as e:
+            logger.warning(f"Failed to find gradient XObject on page {page_num}: {e}")
+            return None
+
 
 class GradientDetector:
     """
@@ -33,6 +467,13 @@ class GradientDetector:
         self.footer_height_pct = 0.10  # Check bottom 10% of page
         self.header_height_pct = 0.10  # Check top 10% of page
         self.render_dpi = 4.0  # High DPI for gradient rendering
+        # Derived constant, built once: footer start as a page fraction
+        self._footer_top_pct = 1.0 - self.footer_height_pct
+        self._renderer = _GradientRenderer(self.render_dpi)
+    
+    def reset_cache(self):
+        """Drop cached per-page image placements (call when moving to a new page or document)."""
+        self._renderer.reset_cache()
     
     def detect_and_extract_gradients(
         self,
@@ -65,42 +506,36 @@ class GradientDetector:
         
         # Define header and footer regions
         header_bottom = page_height * self.header_height_pct
-        footer_top = page_height * (1.0 - self.footer_height_pct)
+        footer_top = page_height * self._footer_top_pct
+        header_rect = fitz.Rect(0, 0, page_width, header_bottom)
+        footer_rect = fitz.Rect(0, footer_top, page_width, page_height)
         
-        # Group drawings by region
-        header_drawings = []
-        footer_drawings = []
+        # A drawing belongs to a region by its center y
+        header_candidates, footer_candidates = _DrawingScanner.region_candidates(
+            drawings, header_bottom, footer_top
+        )
         
-        for drawing in drawings:
-            rect = drawing.get("rect")
-            if not rect:
-                continue
-            
-            # Check if shape is in header or footer region
-            shape_center_y = (rect.y0 + rect.y1) / 2
-            
-            if shape_center_y < header_bottom:
-                header_drawings.append(drawing)
-            elif shape_center_y > footer_top:
-                footer_drawings.append(drawing)
+        # Summarize each region in one pass over its candidates
+        header_scan = _DrawingScanner.scan_region(
+            header_candidates, float('-inf'), header_bottom, header_rect, self.min_complex_items
+        )
+        footer_scan = _DrawingScanner.scan_region(
+            footer_candidates, footer_top, float('inf'), footer_rect, self.min_complex_items
+        )
         
         # Check header for gradient patterns
-        if header_drawings:
+        if header_scan.drawing_count:
             header_gradient = self._detect_gradient_in_region(
-                page, header_drawings, page_num, "header",
-                fitz.Rect(0, 0, page_width, header_bottom),
-                text_elements
+                page, header_scan, page_num, "header", header_rect, text_elements
             )
             if header_gradient:
                 gradient_images.append(header_gradient)
                 logger.info(f"Page {page_num}: Detected gradient pattern in header")
         
         # Check footer for gradient patterns
-        if footer_drawings:
+        if footer_scan.drawing_count:
             footer_gradient = self._detect_gradient_in_region(
-                page, footer_drawings, page_num, "footer",
-                fitz.Rect(0, footer_top, page_width, page_height),
-                text_elements
+                page, footer_scan, page_num, "footer", footer_rect, text_elements
             )
             if footer_gradient:
                 gradient_images.append(footer_gradient)
@@ -111,7 +546,7 @@ class GradientDetector:
     def _detect_gradient_in_region(
         self,
         page: fitz.Page,
-        drawings: List[Dict[str, Any]],
+        scan: _RegionScan,
         page_num: int,
         region_name: str,
         region_rect: fitz.Rect,
@@ -133,7 +568,7 @@ class GradientDetector:
         
         Args:
             page: PyMuPDF page object
-            drawings: List of drawings in the region
+            scan: Summary of the drawings in the region (from _DrawingScanner.scan_region)
             page_num: Page number
             region_name: Name of the region (e.g., "header", "footer")
             region_rect: Rectangle defining the region
@@ -142,35 +577,19 @@ class GradientDetector:
         Returns:
             Image element dictionary if gradient detected, None otherwise
         """
-        if not drawings:
+        if not scan.drawing_count:
             return None
         
-        # Count total path items across all shapes
-        total_items = 0
-        complex_shapes = []
-        
-        for drawing in drawings:
-            items = drawing.get("items", [])
-            item_count = len(items)
-            total_items += item_count
-            
-            # Consider shapes with many items as "complex"
-            if item_count > 50:
-                complex_shapes.append(drawing)
-        
         # Check if this region has enough complexity to be a gradient
         # Criteria: Either many total items OR multiple complex shapes
-        has_many_items = total_items > self.min_complex_items
-        has_multiple_complex = len(complex_shapes) >= 2
-        
-        if not (has_many_items or has_multiple_complex):
+        if not scan.is_complex:
             logger.debug(f"Page {page_num} {region_name}: Not a gradient "
-                        f"(total_items={total_items}, complex_shapes={len(complex_shapes)})")
+                        f"(total_items={scan.total_items}, complex_shapes={scan.complex_count})")
             return None
         
         # CRITICAL FIX: Look for the original XObject (embedded image) in this region
         # Instead of rendering the whole region, we extract the actual gradient image
-        gradient_xobject = self._find_gradient_xobject_in_region(page, region_rect, page_num)
+        gradient_xobject = self._renderer.find_gradient_xobject_in_region(page, region_rect, page_num)
         
         if gradient_xobject:
             # Found an embedded image XObject - use it directly!
@@ -205,26 +624,19 @@ class GradientDetector:
         logger.info(f"Page {page_num} {region_name}: No gradient XObject found, "
                    f"gradient is composed of vector shapes - calculating actual bbox")
         
-        # CRITICAL: Only pass drawings that are WITHIN the region
-        # The 'drawings' list contains ALL drawings classified to this region by center point,
-        # but their actual rect might extend far outside. We need to clip to region bounds.
-        region_drawings = []
-        for drawing in drawings:
-            rect = drawing.get("rect")
-            if not rect:
-                continue
-            # Only include if the shape is actually within the region bounds
-            if (rect.y0 >= region_rect.y0 and rect.y1 <= region_rect.y1):
-                region_drawings.append(drawing)
+        # CRITICAL: Only use drawings that are WITHIN the region
+        # Drawings are classified to this region by center point, but their actual
+        # rect might extend far outside; the scan kept only those inside the bounds.
+        region_drawings = scan.inside_drawings
         
         if not region_drawings:
             logger.warning(f"Page {page_num} {region_name}: No drawings actually within region bounds")
             return None
         
-        logger.debug(f"Page {page_num} {region_name}: {len(region_drawings)} of {len(drawings)} drawings are within region bounds")
+        logger.debug(f"Page {page_num} {region_name}: {len(region_drawings)} of {scan.drawing_count} drawings are within region bounds")
         
         # Calculate the actual bounding box of the drawings in this region
-        actual_bbox = self._calculate_actual_bbox(region_drawings)
+        actual_bbox = _DrawingScanner.calculate_actual_bbox(region_drawings)
         
         if not actual_bbox:
             logger.warning(f"Page {page_num} {region_name}: Could not calculate bbox for vector gradient")
@@ -258,24 +670,19 @@ class GradientDetector:
         
         try:
             # Render at high resolution using ACTUAL bbox
-            zoom = self.render_dpi
-            matrix = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=matrix, clip=actual_rect, alpha=True)
-            
-            image_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(image_data))
+            image_data, width_px, height_px = self._renderer.render_region(page, actual_rect)
             
             # This is a complex pattern that should be rendered as image!
             logger.info(f"Page {page_num} {region_name}: Rendered vector gradient with "
-                       f"{total_items} path items, {len(complex_shapes)} complex shapes as image "
-                       f"({img.width}x{img.height}px)")
+                       f"{scan.total_items}+ path items, {scan.complex_count}+ complex shapes as image "
+                       f"({width_px}x{height_px}px)")
             
             return {
                 'type': 'image',
                 'image_data': image_data,
                 'image_format': 'png',
-                'width_px': img.width,
-                'height_px': img.height,
+                'width_px': width_px,
+                'height_px': height_px,
                 'x': actual_rect.x0,
                 'y': actual_rect.y0,
                 'x2': actual_rect.x1,
@@ -292,59 +699,6 @@ class GradientDetector:
             logger.warning(f"Failed to render {region_name} gradient on page {page_num}: {e}")
             return None
     
-    def _check_for_color_variation(self, img: Image.Image) -> bool:
-        """
-        Check if an image contains significant color variation (gradient).
-        
-        Samples pixels across the image and checks if there's color variation
-        that indicates a gradient pattern.
-        
-        Args:
-            img: PIL Image to check
-            
-        Returns:
-            True if significant color variation detected, False otherwise
-        """
-        if img.width < 20 or img.height < 5:
-            return False
-        
-        # Sample pixels horizontally across the middle row
-        mid_y = img.height // 2
-        sample_count = min(10, img.width // 10)
-        
-        samples = []
-        for i in range(sample_count):
-            x = int((i + 0.5) * img.width / sample_count)
-            x = min(x, img.width - 1)
-            try:
-                pixel = img.getpixel((x, mid_y))
-                # Convert to RGB if needed
-                if isinstance(pixel, int):
-                    pixel = (pixel, pixel, pixel)
-                samples.append(pixel[:3])  # Take RGB only
-            except:
-                continue
-        
-        if len(samples) < 2:
-            return False
-        
-        # Calculate color variation across samples
-        first_pixel = samples[0]
-        max_variation = 0
-        
-        for pixel in samples[1:]:
-            variation = max(abs(a - b) for a, b in zip(first_pixel, pixel))
-            max_variation = max(max_variation, variation)
-        
-        # Threshold: at least 10 color units of variation indicates gradient
-        threshold = 10
-        has_gradient = max_variation > threshold
-        
-        if has_gradient:
-            logger.debug(f"Color variation detected: {max_variation} > {threshold}")
-        
-        return has_gradient
-    
     def _detect_page_numbers_in_region(
         self,
         text_elements: List[Dict[str, Any]],
@@ -367,8 +721,6 @@ class GradientDetector:
         Returns:
             List of bounding boxes (x, y, x2, y2) for detected page numbers
         """
-        import re
-        
         page_width = page.rect.width
         page_height = page.rect.height
         page_number_bboxes = []
@@ -378,13 +730,15 @@ class GradientDetector:
             if not text:
                 continue
             
-            # Pattern 1: "N/M" format (e.g., "3/10", "1/10")
-            is_n_slash_m = bool(re.match(r'^\d+/\d+$', text))
-            
-            # Pattern 2: Single digit or double digit number
-            is_single_number = text.isdigit() and len(text) <= 2
-            
-            if not (is_n_slash_m or is_single_number):
+            # Pattern 1: Single digit or double digit number (cheap C-level test first)
+            # Pattern 2: "N/M" format (e.g., "3/10", "1/10")
+            if text.isdigit():
+                if len(text) > 2:
+                    continue
+                is_single_number = True
+            elif _N_SLASH_M_RE.match(text):
+                is_single_number = False
+            else:
                 continue
             
             # Check position
@@ -412,7 +766,7 @@ class GradientDetector:
             
             # This is a page number in the region
             page_number_bboxes.append((elem_x, elem_y, elem_x2, elem_y2))
-            logger.debug(f"Detected page number '{text}' in region at ({elem_x:.1f}, {elem_y:.1f})")
+            logger.debug("Detected page number '%s' in region at (%.1f, %.1f)", text, elem_x, elem_y)
         
         return page_number_bboxes
     
@@ -434,173 +788,52 @@ class GradientDetector:
         if not gradient_regions:
             return False
         
-        shape_center_x = (shape.get('x', 0) + shape.get('x2', 0)) / 2
-        shape_center_y = (shape.get('y', 0) + shape.get('y2', 0)) / 2
-        
-        for gradient in gradient_regions:
-            gx0, gy0 = gradient['x'], gradient['y']
-            gx1, gy1 = gradient['x2'], gradient['y2']
-            
-            # Check if shape center is within gradient bbox
-            if (gx0 <= shape_center_x <= gx1 and
-                gy0 <= shape_center_y <= gy1):
-                return True
-        
-        return False
+        return self._is_center_in_bboxes(shape, self._gradient_bboxes(gradient_regions))
     
-    def _calculate_actual_bbox(self, drawings: List[Dict[str, Any]]) -> Optional[Tuple[float, float, float, float]]:
+    def filter_shapes_outside_gradients(
+        self,
+        shapes: List[Dict[str, Any]],
+        gradient_regions: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
         """
-        Calculate the actual bounding box of a list of drawings.
+        Drop the shapes that are part of a gradient (batch should_exclude_shape_in_gradient).
         
-        This is critical for avoiding blank space in rendered gradient images.
-        Instead of rendering the entire region (e.g., bottom 10% of page),
-        we calculate the tight bounding box of the actual vector shapes.
+        The gradient bboxes are read out of their dicts once for the whole
+        list instead of once per shape.
         
         Args:
-            drawings: List of drawing dictionaries
+            shapes: Shape dictionaries
+            gradient_regions: List of detected gradient region dictionaries
             
         Returns:
-            Tuple of (x0, y0, x1, y1) or None if no valid drawings
+            Shapes whose center is outside every gradient region, in order
         """
-        if not drawings:
-            return None
-        
-        min_x = float('inf')
-        min_y = float('inf')
-        max_x = float('-inf')
-        max_y = float('-inf')
-        
-        valid_count = 0
-        for drawing in drawings:
-            rect = drawing.get("rect")
-            if not rect:
-                continue
-            
-            min_x = min(min_x, rect.x0)
-            min_y = min(min_y, rect.y0)
-            max_x = max(max_x, rect.x1)
-            max_y = max(max_y, rect.y1)
-            valid_count += 1
-        
-        if valid_count == 0:
-            return None
+        if not gradient_regions:
+            return shapes
         
-        return (min_x, min_y, max_x, max_y)
+        bboxes = self._gradient_bboxes(gradient_regions)
+        is_center_in_bboxes = self._is_center_in_bboxes
+        return [shape for shape in shapes if not is_center_in_bboxes(shape, bboxes)]
     
-    def _find_gradient_xobject_in_region(
-        self,
-        page: fitz.Page,
-        region_rect: fitz.Rect,
-        page_num: int
-    ) -> Optional[Dict[str, Any]]:
-        """
-        Find the original embedded image XObject that represents the gradient pattern in a region.
+    @staticmethod
+    def _gradient_bboxes(gradient_regions: List[Dict[str, Any]]) -> List[Tuple[float, float, float, float]]:
+        """Collect (x0, y0, x1, y1) of each gradient region."""
+        return [(g['x'], g['y'], g['x2'], g['y2']) for g in gradient_regions]
+    
+    @staticmethod
+    def _is_center_in_bboxes(shape: Dict[str, Any],
+                             bboxes: List[Tuple[float, float, float, float]]) -> bool:
+        """Check if a shape's center lies within any of the bboxes."""
+        shape_center_x = (shape.get('x', 0) + shape.get('x2', 0)) / 2
+        shape_center_y = (shape.get('y', 0) + shape.get('y2', 0)) / 2
         
-        This is the CORRECT way to extract gradient patterns:
-        - Look for embedded images (XObjects) in the region
-        - Extract the original image data directly
-        - Preserve the exact size and position from the PDF
+        for gx0, gy0, gx1, gy1 in bboxes:
+            # Check if shape center is within gradient bbox
+            if (gx0 <= shape_center_x <= gx1 and
+                gy0 <= shape_center_y <= gy1):
+                return True
         
-        Args:
-            page: PyMuPDF page object
-            region_rect: Rectangle defining the region to search
-            page_num: Page number for logging
-            
-        Returns:
-            Image element dictionary if gradient XObject found, None otherwise
-        """
-        try:
-            # Get all images on the page
-            image_list = page.get_images(full=True)
-            
-            if not image_list:
-                logger.debug(f"Page {page_num}: No images found on page")
-                return None
-            
-            # Look for images that overlap with the region
-            # We use overlap ratio instead of just center point to be more flexible
-            best_match = None
-            best_overlap_ratio = 0.0
-            
-            for img_info in image_list:
-                xref = img_info[0]
-                
-                # Get image position(s) on page
-                image_rects = page.get_image_rects(xref)
-                
-                if not image_rects:
-                    continue
-                
-                # Check each occurrence of this image
-                for img_rect in image_rects:
-                    # Calculate overlap with region
-                    # Overlap = intersection area / image area
-                    x_overlap = max(0, min(img_rect.x1, region_rect.x1) - max(img_rect.x0, region_rect.x0))
-                    y_overlap = max(0, min(img_rect.y1, region_rect.y1) - max(img_rect.y0, region_rect.y0))
-                    overlap_area = x_overlap * y_overlap
-                    
-                    img_area = img_rect.width * img_rect.height
-                    if img_area <= 0:
-                        continue
-                    
-                    overlap_ratio = overlap_area / img_area
-                    
-                    # Log all images in region for debugging
-                    if overlap_ratio > 0.1:
-                        logger.debug(f"Page {page_num}: Found image xref={xref} with {overlap_ratio*100:.1f}% overlap, "
-                                   f"position: ({img_rect.x0:.1f}, {img_rect.y0:.1f}), "
-                                   f"size: {img_rect.width:.1f}x{img_rect.height:.1f}pt")
-                    
-                    # Keep track of the best match (highest overlap ratio)
-                    # Require at least 50% overlap to consider it part of the region
-                    if overlap_ratio > best_overlap_ratio and overlap_ratio >= 0.5:
-                        best_overlap_ratio = overlap_ratio
-                        best_match = (xref, img_rect)
-            
-            # If we found a good match, extract it
-            if best_match:
-                xref, img_rect = best_match
-                
-                # Extract the image
-                base_image = page.parent.extract_image(xref)
-                
-                if not base_image:
-                    logger.warning(f"Page {page_num}: Failed to extract image xref={xref}")
-                    return None
-                
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                
-                # Convert to PIL Image to get dimensions
-                pil_image = Image.open(io.BytesIO(image_bytes))
-                
-                logger.info(f"Page {page_num}: Found gradient XObject in region (overlap={best_overlap_ratio*100:.1f}%), "
-                          f"original size: {pil_image.width}x{pil_image.height}px, "
-                          f"position: ({img_rect.x0:.1f}, {img_rect.y0:.1f}), "
-                          f"PDF size: {img_rect.width:.1f}x{img_rect.height:.1f}pt")
-                
-                # Return the image element using original XObject data
-                return {
-                    'type': 'image',
-                    'image_data': image_bytes,
-                    'image_format': image_ext,
-                    'width_px': pil_image.width,
-                    'height_px': pil_image.height,
-                    'x': img_rect.x0,
-                    'y': img_rect.y0,
-                    'x2': img_rect.x1,
-                    'y2': img_rect.y1,
-                    'width': img_rect.width,
-                    'height': img_rect.height,
-                }
-            
-            logger.debug(f"Page {page_num}: No suitable gradient XObject found in region "
-                        f"(best overlap: {best_overlap_ratio*100:.1f}%)")
-            return None
-            
-        except Exception as e:
-            logger.warning(f"Failed to find gradient XObject on page {page_num}: {e}")
-            return None
+        return False
     
     def should_exclude_text_in_gradient(
         self,
@@ -622,27 +855,83 @@ class GradientDetector:
         if not gradient_regions:
             return False
         
+        page_number_bboxes = self._page_number_bboxes(gradient_regions)
+        if not page_number_bboxes:
+            return False
+        
+        return self._matches_page_number_bbox(
+            text_elem, page_number_bboxes, frozenset(page_number_bboxes)
+        )
+    
+    def filter_texts_outside_gradients(
+        self,
+        text_elements: List[Dict[str, Any]],
+        gradient_regions: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Drop page-number texts already rendered inside gradient regions
+        (batch should_exclude_text_in_gradient).
+        
+        The page-number bboxes of all gradients are collected once; when there
+        are none (the usual case) the texts are returned untouched.
+        
+        Args:
+            text_elements: Text element dictionaries
+            gradient_regions: List of detected gradient region dictionaries with page_number_bboxes
+            
+        Returns:
+            Text elements that are not page numbers within a gradient region, in order
+        """
+        if not gradient_regions:
+            return text_elements
+        
+        page_number_bboxes = self._page_number_bboxes(gradient_regions)
+        if not page_number_bboxes:
+            return text_elements
+        
+        exact_bboxes = frozenset(page_number_bboxes)
+        matches = self._matches_page_number_bbox
+        return [elem for elem in text_elements
+                if not matches(elem, page_number_bboxes, exact_bboxes)]
+    
+    @staticmethod
+    def _page_number_bboxes(gradient_regions: List[Dict[str, Any]]) -> Dict[tuple, Any]:
+        """Map every page number bbox of the gradients to its region name (first region wins)."""
+        page_number_bboxes = {}
+        for gradient in gradient_regions:
+            for pn_bbox in gradient.get('page_number_bboxes', []):
+                page_number_bboxes.setdefault(tuple(pn_bbox), gradient.get('gradient_region'))
+        return page_number_bboxes
+    
+    @staticmethod
+    def _matches_page_number_bbox(
+        text_elem: Dict[str, Any],
+        page_number_bboxes: Dict[tuple, Any],
+        exact_bboxes: frozenset
+    ) -> bool:
+        """Check if a text element's bbox matches a page number bbox within 2pt."""
         elem_x = text_elem.get('x', 0)
         elem_y = text_elem.get('y', 0)
         elem_x2 = text_elem.get('x2', 0)
         elem_y2 = text_elem.get('y2', 0)
-        
-        # Check each gradient region
-        for gradient in gradient_regions:
-            page_number_bboxes = gradient.get('page_number_bboxes', [])
-            
-            # Check if this text element matches any page number bbox in this gradient
-            for pn_bbox in page_number_bboxes:
-                pn_x, pn_y, pn_x2, pn_y2 = pn_bbox
-                
-                # Check if bboxes overlap (with small tolerance)
-                tolerance = 2.0
+        elem_bbox = (elem_x, elem_y, elem_x2, elem_y2)
+        
+        # Page number bboxes are taken from these same text elements, so an
+        # exact hit is the common match and needs only a hash lookup
+        if elem_bbox in exact_bboxes:
+            region_name = page_number_bboxes[elem_bbox]
+        else:
+            # Check if bboxes overlap (with small tolerance)
+            tolerance = 2.0
+            for (pn_x, pn_y, pn_x2, pn_y2), region_name in page_number_bboxes.items():
                 if (abs(elem_x - pn_x) < tolerance and
                     abs(elem_y - pn_y) < tolerance and
                     abs(elem_x2 - pn_x2) < tolerance and
                     abs(elem_y2 - pn_y2) < tolerance):
-                    logger.debug(f"Excluding page number text at ({elem_x:.1f}, {elem_y:.1f}) "
-                               f"- already in gradient region '{gradient.get('gradient_region')}'")
-                    return True
+                    break
+            else:
+                return False
         
-        return False
+        logger.debug("Excluding page number text at (%.1f, %.1f) - already in gradient region '%s'",
+                     elem_x, elem_y, region_name)
+        return True
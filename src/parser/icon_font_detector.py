@@ -7,13 +7,18 @@ and converts them to high-quality bitmap images for proper rendering in PowerPoi
 
 import fitz  # PyMuPDF
 import logging
-from typing import Dict, Any, List, Optional
-from io import BytesIO
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from PIL import Image, ImageDraw, ImageFont
 import os
 
 logger = logging.getLogger(__name__)
 
+# get_text("dict") flags without image blocks (only text spans are inspected)
+_TEXT_DICT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
 
 class IconFontDetector:
     """
@@ -42,6 +47,9 @@ class IconFontDetector:
         'Wingdings'
     ]
     
+    # All name patterns as one alternation, so a font name is scanned once
+    _ICON_FONT_RE = re.compile('|'.join(map(re.escape, ICON_FONT_PATTERNS)))
+    
     # Unicode Private Use Area ranges for icon fonts
     # These ranges are commonly used by icon fonts like Font Awesome
     PRIVATE_USE_RANGES = [
@@ -50,6 +58,16 @@ class IconFontDetector:
         (0x100000, 0x10FFFF) # Supplementary Private Use Area-B
     ]
     
+    # The ranges above flattened to sorted [start, end + 1) boundaries: a code
+    # point lies inside a range exactly when bisect_right() returns an odd index
+    _PRIVATE_USE_BOUNDS = tuple(b for start, end in PRIVATE_USE_RANGES for b in (start, end + 1))
+    
+    # Character class of the ranges above plus the replacement characters
+    # accepted by is_private_use_char
+    _ICON_CHAR_RE = re.compile(
+        '[%s\\uFFFD\\uFFFF]' % ''.join('\\U%08X-\\U%08X' % r for r in PRIVATE_USE_RANGES)
+    )
+    
     def __init__(self, config: Dict[str, Any]):
         """
         Initialize Icon Font Detector.
@@ -60,8 +78,32 @@ class IconFontDetector:
         self.config = config
         # DPI for rendering icons (higher = better quality)
         self.icon_render_dpi = config.get('icon_render_dpi', 600)
+        # Padding around the icon bbox, as a fraction of the font size
+        self.icon_padding_ratio = 0.15
+        # Render matrix for icon_render_dpi, built once: (dpi, fitz.Matrix)
+        self._render_matrix = None
         # Whether to enable icon font detection
         self.enable_icon_detection = config.get('enable_icon_detection', True)
+        # Combined is_icon_font / contains_icon_chars predicate over (font_name, content)
+        self._is_icon = self._build_icon_predicate()
+    
+    @classmethod
+    def _build_icon_predicate(cls):
+        """
+        Build a single predicate equivalent to is_icon_font(font_name) or
+        contains_icon_chars(content), with the cached font check and the
+        character search bound as locals.
+        
+        Returns:
+            Function taking (font_name, content) and returning True for icon text
+        """
+        is_icon_font = cls.is_icon_font
+        char_search = cls._ICON_CHAR_RE.search
+        
+        def is_icon(font_name: str, content: str) -> bool:
+            return is_icon_font(font_name) or (not content.isascii() and char_search(content) is not None)
+        
+        return is_icon
     
     def is_private_use_char(self, char: str) -> bool:
         """
@@ -77,9 +119,8 @@ class IconFontDetector:
             return False
         
         code = ord(char)
-        for start, end in self.PRIVATE_USE_RANGES:
-            if start <= code <= end:
-                return True
+        if bisect_right(self._PRIVATE_USE_BOUNDS, code) & 1:
+            return True
         
         # Also check for replacement character (often used for missing glyphs)
         if code == 0xFFFD or code == 0xFFFF:
@@ -87,10 +128,14 @@ class IconFontDetector:
         
         return False
     
-    def is_icon_font(self, font_name: str) -> bool:
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def is_icon_font(font_name: str) -> bool:
         """
         Check if a font name is an icon font.
         
+        Results are cached: a document only uses a handful of font names.
+        
         Args:
             font_name: Font name from PDF
             
@@ -101,11 +146,7 @@ class IconFontDetector:
             return False
         
         # Check against known patterns
-        for pattern in self.ICON_FONT_PATTERNS:
-            if pattern in font_name:
-                return True
-        
-        return False
+        return IconFontDetector._ICON_FONT_RE.search(font_name) is not None
     
     def contains_icon_chars(self, text: str) -> bool:
         """
@@ -117,7 +158,13 @@ class IconFontDetector:
         Returns:
             True if text contains icon characters
         """
-        return any(self.is_private_use_char(char) for char in text)
+        # CPython stores the widest code point kind with every str, so
+        # isascii() is O(1): pure-ASCII text (most spans) cannot hold icon chars
+        if text.isascii():
+            return False
+        
+        # A single character-class search, run in C and stopping at the first hit
+        return self._ICON_CHAR_RE.search(text) is not None
     
     def detect_icon_in_text_element(self, element: Dict[str, Any]) -> bool:
         """
@@ -129,18 +176,16 @@ class IconFontDetector:
         Returns:
             True if element contains icon font or icon characters
         """
-        font_name = element.get('font_name', '')
-        content = element.get('content', '')
-        
-        # Check if font is an icon font
-        if self.is_icon_font(font_name):
-            return True
-        
-        # Check if content contains private use area characters
-        if self.contains_icon_chars(content):
-            return True
-        
-        return False
+        # Icon font name, or private use area characters in the content
+        return self._is_icon(element.get('font_name', ''), element.get('content', ''))
+    
+    def _get_render_matrix(self) -> fitz.Matrix:
+        """Get the zoom matrix for icon_render_dpi, rebuilding it only if the DPI changed."""
+        if self._render_matrix is None or self._render_matrix[0] != self.icon_render_dpi:
+            # Standard PDF resolution is 72 DPI
+            zoom_factor = self.icon_render_dpi / 72.0
+            self._render_matrix = (self.icon_render_dpi, fitz.Matrix(zoom_factor, zoom_factor))
+        return self._render_matrix[1]
     
     def convert_icon_to_image(
         self, 
@@ -148,7 +193,8 @@ class IconFontDetector:
         bbox: tuple, 
         char: str, 
         color: int, 
-        size: float
+        size: float,
+        display_list: Optional[fitz.DisplayList] = None
     ) -> Optional[bytes]:
         """
         Convert an icon character to a high-quality bitmap image by rendering
@@ -160,14 +206,42 @@ class IconFontDetector:
             char: Icon character (Unicode)
             color: Text color as integer
             size: Font size in points
+            display_list: Optional display list of the page to render from
+                (page.get_pixmap re-interprets the whole page on every call)
             
         Returns:
             Image bytes (PNG format) or None if failed
         """
+        rendered = self._render_icon(page, bbox, char, size, display_list)
+        return rendered[0] if rendered else None
+    
+    def _render_icon(
+        self,
+        page: fitz.Page,
+        bbox: tuple,
+        char: str,
+        size: float,
+        display_list: Optional[fitz.DisplayList] = None
+    ) -> Optional[Tuple[bytes, int, int]]:
+        """
+        Render an icon region (see convert_icon_to_image) and report its pixel size.
+        
+        The size comes from the pixmap, so callers need not decode the PNG again.
+        
+        Args:
+            page: PyMuPDF page object
+            bbox: Bounding box of the icon (x0, y0, x1, y1)
+            char: Icon character (Unicode)
+            size: Font size in points
+            display_list: Optional display list of the page to render from
+            
+        Returns:
+            Tuple of (PNG bytes, width in pixels, height in pixels) or None if failed
+        """
         try:
             # Expand bbox slightly to ensure complete icon capture
             x0, y0, x1, y1 = bbox
-            padding = size * 0.15  # 15% padding
+            padding = size * self.icon_padding_ratio  # 15% padding
             expanded_bbox = fitz.Rect(
                 x0 - padding,
                 y0 - padding,
@@ -175,19 +249,30 @@ class IconFontDetector:
                 y1 + padding
             )
             
-            # Calculate zoom factor based on desired DPI
-            # Standard PDF resolution is 72 DPI
-            zoom_factor = self.icon_render_dpi / 72.0
-            
-            # Create transformation matrix
-            matrix = fitz.Matrix(zoom_factor, zoom_factor)
+            # Skip the high-DPI render when the region lies entirely off the page:
+            # MuPDF clips to the page and cannot encode the resulting empty pixmap.
+            # Allow one output pixel of slack, since the clip is rounded outwards.
+            page_rect = page.rect
+            pixel = 72.0 / self.icon_render_dpi
+            if (min(expanded_bbox.x1, page_rect.x1) + pixel < max(expanded_bbox.x0, page_rect.x0) or
+                    min(expanded_bbox.y1, page_rect.y1) + pixel < max(expanded_bbox.y0, page_rect.y0)):
+                logger.debug(f"Skipped icon at ({x0:.1f}, {y0:.1f}): outside the page")
+                return None
             
-            # Render the icon region as a pixmap
-            pixmap = page.get_pixmap(
-                matrix=matrix,
-                clip=expanded_bbox,
-                alpha=False  # No transparency needed
-            )
+            # Render the icon region as a pixmap at the desired DPI
+            if display_list is not None:
+                pixmap = display_list.get_pixmap(
+                    matrix=self._get_render_matrix(),
+                    colorspace=fitz.csRGB,
+                    clip=expanded_bbox,
+                    alpha=False  # No transparency needed
+                )
+            else:
+                pixmap = page.get_pixmap(
+                    matrix=self._get_render_matrix(),
+                    clip=expanded_bbox,
+                    alpha=False  # No transparency needed
+                )
             
             # Convert to PNG bytes
             img_bytes = pixmap.tobytes("png")
@@ -197,7 +282,7 @@ class IconFontDetector:
                 f"to {pixmap.width}x{pixmap.height}px image"
             )
             
-            return img_bytes
+            return img_bytes, pixmap.width, pixmap.height
             
         except Exception as e:
             logger.warning(f"Failed to convert icon to image: {e}")
@@ -206,7 +291,8 @@ class IconFontDetector:
     def extract_icons_from_page(
         self, 
         page: fitz.Page, 
-        page_num: int
+        page_num: int,
+        text_dict: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Extract all icon font elements from a page and convert them to images.
@@ -214,6 +300,8 @@ class IconFontDetector:
         Args:
             page: PyMuPDF page object
             page_num: Page number (0-indexed)
+            text_dict: Optional page.get_text("dict") result already parsed by
+                the caller (avoids parsing the page's text twice)
             
         Returns:
             List of image element dictionaries for icons
@@ -222,8 +310,12 @@ class IconFontDetector:
             return []
         
         icon_images = []
-        text_dict = page.get_text("dict")
+        if text_dict is None:
+            text_dict = page.get_text("dict", flags=_TEXT_DICT_FLAGS)
         
+        # Collect the icon spans first, so the renders can share one display list
+        icon_spans = []
+        is_icon = self._is_icon
         for block in text_dict.get("blocks", []):
             if block.get("type") != 0:  # Skip non-text blocks
                 continue
@@ -231,61 +323,57 @@ class IconFontDetector:
             for line in block.get("lines", []):
                 for span in line.get("spans", []):
                     font_name = span.get("font", "")
-                    bbox = span.get("bbox", [0, 0, 0, 0])
                     text = span.get("text", "")
-                    color = span.get("color", 0)
-                    size = span.get("size", 12)
                     
                     if not text:
                         continue
                     
                     # Check if this is an icon font OR contains icon characters
-                    is_icon = self.is_icon_font(font_name) or self.contains_icon_chars(text)
-                    
-                    if not is_icon:
-                        continue
-                    
-                    # Convert icon to image
-                    img_bytes = self.convert_icon_to_image(
-                        page, bbox, text, color, size
-                    )
-                    
-                    if img_bytes:
-                        # Get image dimensions
-                        try:
-                            pil_image = Image.open(BytesIO(img_bytes))
-                            width_px = pil_image.width
-                            height_px = pil_image.height
-                        except:
-                            width_px = int((bbox[2] - bbox[0]) * 4)
-                            height_px = int((bbox[3] - bbox[1]) * 4)
-                        
-                        # Create image element
-                        icon_element = {
-                            'type': 'image',
-                            'image_data': img_bytes,
-                            'image_format': 'png',
-                            'width_px': width_px,
-                            'height_px': height_px,
-                            'x': bbox[0],
-                            'y': bbox[1],
-                            'x2': bbox[2],
-                            'y2': bbox[3],
-                            'width': bbox[2] - bbox[0],
-                            'height': bbox[3] - bbox[1],
-                            'image_id': f"page{page_num}_icon_{len(icon_images)}",
-                            'is_icon': True,
-                            'icon_font': font_name,
-                            'icon_char': text,
-                            'icon_unicode': hex(ord(text))
-                        }
-                        
-                        icon_images.append(icon_element)
-                        
-                        logger.info(
-                            f"Converted icon '{hex(ord(text))}' from {font_name} "
-                            f"at ({bbox[0]:.1f}, {bbox[1]:.1f}) to image"
-                        )
+                    if is_icon(font_name, text):
+                        icon_spans.append(span)
+        
+        # With several icons, interpret the page once and render every clip from
+        # the display list; a single icon keeps the plain clip render
+        display_list = page.get_displaylist(annots=True) if len(icon_spans) >= 2 else None
+        
+        for span in icon_spans:
+            font_name = span.get("font", "")
+            bbox = span.get("bbox", [0, 0, 0, 0])
+            text = span.get("text", "")
+            size = span.get("size", 12)
+            
+            # Convert icon to image; the pixmap reports the image dimensions
+            rendered = self._render_icon(page, bbox, text, size, display_list)
+            
+            if rendered and rendered[0]:
+                img_bytes, width_px, height_px = rendered
+                
+                # Create image element
+                icon_element = {
+                    'type': 'image',
+                    'image_data': img_bytes,
+                    'image_format': 'png',
+                    'width_px': width_px,
+                    'height_px': height_px,
+                    'x': bbox[0],
+                    'y': bbox[1],
+                    'x2': bbox[2],
+                    'y2': bbox[3],
+                    'width': bbox[2] - bbox[0],
+                    'height': bbox[3] - bbox[1],
+                    'image_id': f"page{page_num}_icon_{len(icon_images)}",
+                    'is_icon': True,
+                    'icon_font': font_name,
+                    'icon_char': text,
+                    'icon_unicode': hex(ord(text))
+                }
+                
+                icon_images.append(icon_element)
+                
+                logger.info(
+                    f"Converted icon '{hex(ord(text))}' from {font_name} "
+                    f"at ({bbox[0]:.1f}, {bbox[1]:.1f}) to image"
+                )
         
         return icon_images
     
@@ -299,10 +387,8 @@ class IconFontDetector:
         Returns:
             Set of indices that are icons
         """
-        icon_indices = set()
-        
-        for i, element in enumerate(text_elements):
-            if self.detect_icon_in_text_element(element):
-                icon_indices.add(i)
-        
-        return icon_indices
+        is_icon = self._is_icon
+        return {
+            i for i, element in enumerate(text_elements)
+            if is_icon(element.get('font_name', ''), element.get('content', ''))
+        }
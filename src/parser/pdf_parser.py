@@ -4,8 +4,17 @@ PDF Parser - Main parser class for extracting content from PDF files
 
 import fitz  # PyMuPDF
 import logging
+import math
+import os
 import re
-from typing import List, Dict, Any, Tuple, Optional
+import struct
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import compress
+from multiprocessing.util import Finalize
+from operator import itemgetter
+from typing import List, Dict, Any, Iterator, Tuple, Optional
 from pathlib import Path
 import io
 from PIL import Image
@@ -19,11 +28,79 @@ from .gradient_detector import GradientDetector
 
 logger = logging.getLogger(__name__)
 
+# get_text("dict") flags without image blocks: every consumer walks only the
+# text blocks, and preserving images copies each image's binary data into the dict
+_TEXT_DICT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Patterns for the page's ExtGState resources and content stream operators
+# Graphics state references with flexible naming: /GS1 12 0 R, /a1 7 0 R, ...
+_GS_REF_RE = re.compile(r'/([A-Za-z]+\d*)\s+(\d+)\s+\d+\s+R')
+_CA_RE = re.compile(r'/ca\s+([\d.]+)')
+_GS_NAME_BYTES_RE = re.compile(rb'/([A-Za-z]+\d*)')
+# Position/size tolerance (pt) within which two shapes can be overlapping duplicates
+_SHAPE_DUPLICATE_TOLERANCE = 2.0
+
+# Content stream operators that affect fill opacity tracking
+_OPACITY_EVENT_TOKENS = frozenset((b'gs', b're', b'f', b'f*'))
+# Page number text such as "3/12"
+_PAGE_FRACTION_RE = re.compile(r'^\d+/\d+$')
+
+# Span flag bits (fitz.TEXT_FONT_BOLD / fitz.TEXT_FONT_ITALIC)
+_BOLD_MASK = 1 << 4
+_ITALIC_MASK = 1 << 1
+
+# Parser owned by a page worker process (see PDFParser.iter_pages)
+_worker_parser = None
+
+
+def _init_page_worker(config: Dict[str, Any], pdf_path: str):
+    """Open the PDF once in a page worker process (fitz documents cannot be pickled)."""
+    global _worker_parser
+    _worker_parser = PDFParser(config)
+    if not _worker_parser.open(pdf_path):
+        raise RuntimeError(f"Page worker failed to open PDF: {pdf_path}")
+    # Release the document and the image-prep threads when the worker exits;
+    # forked workers leave through os._exit, which skips atexit handlers
+    Finalize(None, _worker_parser.close, exitpriority=0)
+
+
+def _parse_page_in_worker(page_num: int) -> Dict[str, Any]:
+    """Extract one page with the worker process's parser."""
+    return _worker_parser.extract_page_elements(page_num)
+
+
+def _png_size(png_data: bytes) -> Tuple[int, int]:
+    """
+    Read the pixel size of PNG data from its IHDR chunk, without PIL.
+    
+    Args:
+        png_data: Encoded PNG image
+        
+    Returns:
+        Tuple of (width, height) in pixels
+    """
+    # 8-byte signature, then the IHDR chunk: length, type, width, height
+    if png_data[:8] == b'\x89PNG\r\n\x1a\n' and png_data[12:16] == b'IHDR':
+        return struct.unpack('>II', png_data[16:24])
+    return Image.open(io.BytesIO(png_data)).size
+
+
+@lru_cache(maxsize=256)
+def _rgb_components_to_hex(r: float, g: float, b: float) -> str:
+    """Format float RGB components (0-1) as a hex color; documents reuse a small palette."""
+    return "#%02X%02X%02X" % (int(r * 255), int(g * 255), int(b * 255))
+
 
 class PDFParser:
     """
     Main PDF parser that extracts text, images, and layout information from PDF files.
     Uses PyMuPDF (fitz) for high-precision extraction.
+    
+    Page extraction is sequential by default. Setting page_workers to N > 1, or
+    0 for one per CPU, opts iter_pages/extract_all_pages into worker processes:
+    each reopens the PDF, log lines from the workers interleave, and on
+    spawn-based platforms (Windows, macOS) the calling script must guard its
+    entry point with if __name__ == '__main__'.
     """
     
     def __init__(self, config: Dict[str, Any]):
@@ -39,7 +116,24 @@ class PDFParser:
         self.image_format = config.get('image_format', 'PNG')
         self.min_text_size = config.get('min_text_size', 6)
         self.max_text_size = config.get('max_text_size', 72)
+        # Worker processes for extract_all_pages (1 = sequential, the default;
+        # opt in with N > 1, or 0 for one per CPU up to 6)
+        self.page_workers = config.get('page_workers', 1)
+        # Threads decoding and quality-checking embedded images while the rest
+        # of the page is parsed (0 = do it inline in _extract_images)
+        self.image_prep_workers = config.get('image_prep_workers', 4)
+        self._image_prep_executor = None
+        # Percentage of the MuPDF store to free after each page (0 = keep everything cached).
+        # Opt-in: shrinking caps memory on very long PDFs but reloads fonts on every page
+        self.store_shrink_percent = config.get('store_shrink_percent', 0)
         self.doc = None
+        self.pdf_path = None
+        # get_text("dict") of the page being extracted: (page number, dict)
+        self._text_dict = None
+        # extract_image() results by xref, so images repeated across pages are decoded once
+        self._xref_cache: Dict[int, Dict[str, Any]] = {}
+        # Fill opacity (/ca, or None) of ExtGState objects by xref; pages share them
+        self._gs_opacity_cache: Dict[int, Optional[float]] = {}
         
         # Initialize border detector, shape merger, chart detector, table detector, text overlap detector, icon detector, and gradient detector
         self.border_detector = BorderDetector(config)
@@ -62,6 +156,9 @@ class PDFParser:
         """
         try:
             self.doc = fitz.open(pdf_path)
+            self.pdf_path = pdf_path
+            self._xref_cache = {}
+            self._gs_opacity_cache = {}
             logger.info(f"Successfully opened PDF: {pdf_path}")
             logger.info(f"Total pages: {len(self.doc)}")
             return True
@@ -74,6 +171,37 @@ class PDFParser:
         if self.doc:
             self.doc.close()
             self.doc = None
+        # Cached chart renders are keyed by page number, so they belong to this document
+        self.chart_detector.clear_render_cache()
+        self.gradient_detector.reset_cache()
+        self._text_dict = None
+        self._xref_cache = {}
+        self._gs_opacity_cache = {}
+        if self._image_prep_executor is not None:
+            self._image_prep_executor.shutdown(wait=True)
+            self._image_prep_executor = None
+    
+    def _shrink_store(self):
+        """Free cached MuPDF resources (fonts, images, display lists) held in the global store."""
+        if self.store_shrink_percent > 0:
+            fitz.TOOLS.store_shrink(self.store_shrink_percent)
+    
+    def _get_text_dict(self, page: fitz.Page) -> Dict[str, Any]:
+        """
+        Get page.get_text("dict") for a page, parsed once per page.
+        
+        Text extraction, icon detection and the header/footer background checks
+        all walk the same spans; the dict is shared read-only between them.
+        
+        Args:
+            page: PyMuPDF page object
+            
+        Returns:
+            Text dictionary of the page
+        """
+        if self._text_dict is None or self._text_dict[0] != page.number:
+            self._text_dict = (page.number, page.get_text("dict", flags=_TEXT_DICT_FLAGS))
+        return self._text_dict[1]
     
     def get_page_count(self) -> int:
         """Get the total number of pages in the PDF."""
@@ -127,7 +255,7 @@ class PDFParser:
             
             # Step 1: Extract text bounding boxes
             text_bboxes = []
-            text_dict = page.get_text("dict")
+            text_dict = self._get_text_dict(page)
             for block in text_dict.get("blocks", []):
                 if block.get("type") == 0:  # Text block
                     for line in block.get("lines", []):
@@ -232,6 +360,10 @@ class PDFParser:
         page = self.doc[page_num]
         rect = page.rect
         
+        # Per-page caches from the previous page no longer apply
+        self.gradient_detector.reset_cache()
+        self._text_dict = None
+        
         page_data = {
             'page_num': page_num,
             'width': rect.width,
@@ -255,24 +387,36 @@ class PDFParser:
             else:
                 logger.warning(f"Page {page_num + 1}: Failed to generate background layer")
         
+        # Start decoding embedded images in the background; the text, icon and
+        # drawing passes below run meanwhile (PIL and NumPy release the GIL)
+        prepared_images = self._start_image_prep(page) if self.extract_images else None
+        
         # Extract ExtGState opacity mapping for this page
         opacity_map = self._extract_opacity_map(page)
         
         # Extract icon fonts as images BEFORE extracting regular text
         # This prevents icon characters from being rendered as text
-        icon_images = self.icon_detector.extract_icons_from_page(page, page_num)
+        # The page's text dict is computed once and shared with text extraction below
+        text_dict = self._get_text_dict(page)
+        icon_images = self.icon_detector.extract_icons_from_page(
+            page, page_num, text_dict=text_dict
+        )
         if icon_images:
             page_data['elements'].extend(icon_images)
             logger.info(f"Page {page_num}: Extracted {len(icon_images)} icon font(s) as images")
         
         # Extract text blocks (icons will be filtered out)
-        text_elements = self._extract_text_blocks(page)
+        text_elements = self._extract_text_blocks(page, text_dict)
         
         # Filter out text elements that are icons
         icon_indices = self.icon_detector.get_icon_text_indices(text_elements)
-        filtered_text_elements = [
-            elem for i, elem in enumerate(text_elements) if i not in icon_indices
-        ]
+        if icon_indices:
+            filtered_text_elements = [
+                elem for i, elem in enumerate(text_elements) if i not in icon_indices
+            ]
+        else:
+            # Most pages have no icon text: keep the list rather than copying it
+            filtered_text_elements = text_elements
         
         if icon_indices:
             logger.info(f"Page {page_num}: Filtered out {len(icon_indices)} icon font text element(s)")
@@ -289,16 +433,16 @@ class PDFParser:
         
         # Extract images (pass text elements for overlap detection and gradient images to avoid duplicates)
         if self.extract_images:
-            image_elements = self._extract_images(page, page_num, filtered_text_elements, gradient_images)
+            image_elements = self._extract_images(page, page_num, filtered_text_elements, gradient_images,
+                                                  prepared_images)
             page_data['elements'].extend(image_elements)
             
             # CRITICAL: Filter out page numbers that are within gradient regions
             # This prevents page number duplication when gradients are rendered as images
             original_count = len(filtered_text_elements)
-            filtered_text_elements = [
-                elem for elem in filtered_text_elements
-                if not self.gradient_detector.should_exclude_text_in_gradient(elem, gradient_images)
-            ]
+            filtered_text_elements = self.gradient_detector.filter_texts_outside_gradients(
+                filtered_text_elements, gradient_images
+            )
             excluded_count = original_count - len(filtered_text_elements)
             if excluded_count > 0:
                 logger.info(f"Page {page_num}: Excluded {excluded_count} page number text element(s) "
@@ -315,6 +459,13 @@ class PDFParser:
             drawing_elements, page, filtered_text_elements
         )
         
+        # Shape centers are tested against every table and chart region below,
+        # so compute them once per page rather than once per region
+        shape_centers = [
+            ((shape['x'] + shape['x2']) / 2, (shape['y'] + shape['y2']) / 2)
+            for shape in drawing_elements
+        ]
+        
         # Mark shapes and texts in table regions for exclusion from individual rendering
         table_shape_ids = set()
         table_text_ids = set()
@@ -339,9 +490,7 @@ class PDFParser:
             )
             
             # Mark shapes in table region (borders, cell backgrounds)
-            for shape in drawing_elements:
-                shape_center_x = (shape['x'] + shape['x2']) / 2
-                shape_center_y = (shape['y'] + shape['y2']) / 2
+            for shape, (shape_center_x, shape_center_y) in zip(drawing_elements, shape_centers):
                 if (extended_bbox[0] <= shape_center_x <= extended_bbox[2] and
                     extended_bbox[1] <= shape_center_y <= extended_bbox[3]):
                     table_shape_ids.add(id(shape))
@@ -377,11 +526,12 @@ class PDFParser:
         chart_regions = self.chart_detector.detect_chart_regions(page, non_table_shapes)
         
         # Convert chart regions to high-resolution images
+        chart_images = self.chart_detector.render_charts_as_images(
+            page, [chart_region['bbox'] for chart_region in chart_regions]
+        )
         chart_shape_ids = set()
-        for chart_region in chart_regions:
-            # Render chart as image
+        for chart_region, image_data in zip(chart_regions, chart_images):
             chart_bbox = chart_region['bbox']
-            image_data = self.chart_detector.render_chart_as_image(page, chart_bbox)
             
             # Create image element to replace the chart shapes
             chart_image_elem = {
@@ -402,9 +552,7 @@ class PDFParser:
             
             # Get actual image dimensions
             try:
-                pil_image = Image.open(io.BytesIO(image_data))
-                chart_image_elem['width_px'] = pil_image.width
-                chart_image_elem['height_px'] = pil_image.height
+                chart_image_elem['width_px'], chart_image_elem['height_px'] = _png_size(image_data)
             except Exception as e:
                 logger.warning(f"Failed to get chart image dimensions: {e}")
             
@@ -413,11 +561,8 @@ class PDFParser:
             # Mark shapes in this chart region for exclusion
             # Include ALL shapes that are within the chart bbox, not just clustered ones
             chart_bbox = chart_region['bbox']
-            for shape in drawing_elements:
+            for shape, (shape_center_x, shape_center_y) in zip(drawing_elements, shape_centers):
                 # Check if shape is within chart region bbox
-                shape_center_x = (shape['x'] + shape['x2']) / 2
-                shape_center_y = (shape['y'] + shape['y2']) / 2
-                
                 if (chart_bbox[0] <= shape_center_x <= chart_bbox[2] and
                     chart_bbox[1] <= shape_center_y <= chart_bbox[3]):
                     chart_shape_ids.add(id(shape))
@@ -454,22 +599,40 @@ class PDFParser:
         logger.info(f"Page {page_num}: Extracted {len(page_data['elements'])} elements "
                    f"({len(table_regions)} tables, {len(chart_regions)} charts rendered as images)")
         
+        # Drop this page's text dict, display list and MuPDF store entries so
+        # long documents do not accumulate every page's allocations
+        self.gradient_detector.reset_cache()
+        self._text_dict = None
+        self._shrink_store()
+        
         return page_data
     
-    def _extract_text_blocks(self, page: fitz.Page) -> List[Dict[str, Any]]:
+    def _extract_text_blocks(self, page: fitz.Page, text_dict: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
         Extract text blocks with detailed formatting information.
         
         Args:
             page: PyMuPDF page object
+            text_dict: Optional page.get_text("dict") result already computed for the page
             
         Returns:
             List of text element dictionaries
         """
         text_elements = []
+        # Loop invariants as locals (the span loop runs once per span on the page)
+        append_element = text_elements.append
+        min_text_size = self.min_text_size
+        max_text_size = self.max_text_size
+        bold_mask = _BOLD_MASK
+        italic_mask = _ITALIC_MASK
+        # PyMuPDF creates a new font name string for every span; keep one shared
+        # object per distinct name so a page's elements do not carry thousands of copies
+        font_names = {}
+        share_font_name = font_names.setdefault
         
         # Use dict format for detailed text information
-        text_dict = page.get_text("dict")
+        if text_dict is None:
+            text_dict = self._get_text_dict(page)
         
         for block in text_dict.get("blocks", []):
             if block.get("type") == 0:  # Text block
@@ -478,98 +641,155 @@ class PDFParser:
                     # dir field is a tuple (dx, dy) indicating text direction
                     line_dir = line.get("dir", (1.0, 0.0))
                     
+                    # Calculate rotation angle from direction vector (shared by all spans of the line)
+                    # dir is (dx, dy) - the direction of text baseline
+                    # angle = atan2(dy, dx) in radians, convert to degrees
+                    dx, dy = line_dir
+                    rotation_angle = math.degrees(math.atan2(dy, dx))
+                    
+                    # Normalize angle to [-180, 180] range
+                    while rotation_angle > 180:
+                        rotation_angle -= 360
+                    while rotation_angle < -180:
+                        rotation_angle += 360
+                    
+                    # Check if text is significantly rotated (more than 5 degrees)
+                    is_rotated = abs(rotation_angle) > 5
+                    
                     for span in line.get("spans", []):
                         # Filter by font size
                         font_size = span.get("size", 0)
-                        if font_size < self.min_text_size or font_size > self.max_text_size:
+                        if font_size < min_text_size or font_size > max_text_size:
                             continue
                         
-                        bbox = span.get("bbox", [0, 0, 0, 0])
-                        text = span.get("text", "")
-                        
                         # Only strip leading/trailing newlines and tabs, preserve spaces
                         # Spaces at boundaries are important for text merging (e.g., "2.3.1 " + "text")
-                        text = text.strip('\n\r\t')
+                        text = span.get("text", "").strip('\n\r\t')
                         
                         if not text:
                             continue
                         
-                        # Calculate rotation angle from direction vector
-                        # dir is (dx, dy) - the direction of text baseline
-                        # angle = atan2(dy, dx) in radians, convert to degrees
-                        import math
-                        dx, dy = line_dir
-                        rotation_angle = math.degrees(math.atan2(dy, dx))
+                        x0, y0, x1, y1 = span.get("bbox", (0, 0, 0, 0))
+                        flags = span.get("flags", 0)
+                        font_name = span.get("font", "")
                         
-                        # Normalize angle to [-180, 180] range
-                        while rotation_angle > 180:
-                            rotation_angle -= 360
-                        while rotation_angle < -180:
-                            rotation_angle += 360
-                        
-                        # For rotated text, we need special handling of position
-                        # The bbox is the rotated bounding rectangle, but for positioning in PowerPoint,
-                        # we need to use the text baseline position (origin) and calculate correct dimensions
-                        origin = span.get("origin", (bbox[0], bbox[1]))
-                        
-                        # Check if text is significantly rotated (more than 5 degrees)
-                        is_rotated = abs(rotation_angle) > 5
+                        element = {
+                            'type': 'text',
+                            'content': text,
+                            'x': x0,
+                            'y': y0,
+                            'x2': x1,
+                            'y2': y1,
+                            'width': x1 - x0,
+                            'height': y1 - y0,
+                            'font_name': share_font_name(font_name, font_name),
+                            'font_size': font_size,
+                            'color': span.get("color", 0),  # Converted to hex below
+                            'flags': flags,
+                            'is_bold': bool(flags & bold_mask),
+                            'is_italic': bool(flags & italic_mask),
+                            'rotation': rotation_angle,
+                            'text_dir': line_dir,
+                        }
                         
                         if is_rotated:
                             # For rotated text, use bbox as the physical boundaries
                             # but store origin for future reference if needed
                             # The key insight: bbox is already correct for the rotated text rectangle
                             # We just need to ensure we don't try to "correct" it
-                            
-                            # Use bbox as-is for rotated text
-                            # This preserves the actual rendered position in PDF
-                            element = {
-                                'type': 'text',
-                                'content': text,
-                                'x': bbox[0],
-                                'y': bbox[1],
-                                'x2': bbox[2],
-                                'y2': bbox[3],
-                                'width': bbox[2] - bbox[0],
-                                'height': bbox[3] - bbox[1],
-                                'font_name': span.get("font", ""),
-                                'font_size': font_size,
-                                'color': self._rgb_to_hex(span.get("color", 0)),
-                                'flags': span.get("flags", 0),
-                                'is_bold': bool(span.get("flags", 0) & 2**4),
-                                'is_italic': bool(span.get("flags", 0) & 2**1),
-                                'rotation': rotation_angle,
-                                'text_dir': line_dir,
-                                'origin': origin,  # Store origin for reference
-                                'is_rotated': True
-                            }
+                            element['origin'] = span.get("origin", (x0, y0))  # Store origin for reference
+                            element['is_rotated'] = True
                         else:
                             # For non-rotated text, use bbox as usual
-                            element = {
-                                'type': 'text',
-                                'content': text,
-                                'x': bbox[0],
-                                'y': bbox[1],
-                                'x2': bbox[2],
-                                'y2': bbox[3],
-                                'width': bbox[2] - bbox[0],
-                                'height': bbox[3] - bbox[1],
-                                'font_name': span.get("font", ""),
-                                'font_size': font_size,
-                                'color': self._rgb_to_hex(span.get("color", 0)),
-                                'flags': span.get("flags", 0),
-                                'is_bold': bool(span.get("flags", 0) & 2**4),
-                                'is_italic': bool(span.get("flags", 0) & 2**1),
-                                'rotation': rotation_angle,
-                                'text_dir': line_dir,
-                                'is_rotated': False
-                            }
+                            element['is_rotated'] = False
                         
-                        text_elements.append(element)
+                        append_element(element)
+        
+        # Spans reuse a handful of colors: convert each distinct sRGB int to hex once
+        hex_colors = {color: self._rgb_to_hex(color) for color in {element['color'] for element in text_elements}}
+        for element in text_elements:
+            element['color'] = hex_colors[element['color']]
         
         return text_elements
     
-    def _extract_images(self, page: fitz.Page, page_num: int, text_elements: List[Dict[str, Any]] = None, gradient_images: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    def _get_base_image(self, xref: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the extract_image() result for an image xref.
+        
+        Logos, headers and backgrounds share one xref across pages, so results
+        are cached for the document.
+        
+        Args:
+            xref: Image XObject xref
+            
+        Returns:
+            extract_image() dictionary (may be empty for unsupported images)
+        """
+        base_image = self._xref_cache.get(xref)
+        if base_image is None:
+            base_image = self.doc.extract_image(xref)
+            self._xref_cache[xref] = base_image
+        return base_image
+    
+    def _prepare_image(self, image_bytes: bytes, rect: fitz.Rect) -> Tuple[Image.Image, Any]:
+        """
+        Decode an embedded image and run its quality check.
+        
+        Runs on the image-prep threads: it only uses PIL and NumPy, never the
+        fitz document.
+        
+        Args:
+            image_bytes: Encoded image data from extract_image()
+            rect: Placement of the image on the page
+            
+        Returns:
+            Tuple of (PIL image, _check_image_quality result)
+        """
+        pil_image = Image.open(io.BytesIO(image_bytes))
+        return pil_image, self._check_image_quality(pil_image, rect)
+    
+    def _start_image_prep(self, page: fitz.Page) -> Dict[int, Tuple[List[fitz.Rect], Future]]:
+        """
+        Submit the decode and quality check of every image placed on the page.
+        
+        The fitz calls (extract_image, get_image_rects) stay on this thread;
+        _extract_images later picks up the results instead of doing the work inline.
+        
+        Args:
+            page: PyMuPDF page object
+            
+        Returns:
+            Dictionary mapping xref to (image rects, future of _prepare_image)
+        """
+        if self.image_prep_workers <= 0:
+            return {}
+        
+        if self._image_prep_executor is None:
+            self._image_prep_executor = ThreadPoolExecutor(max_workers=self.image_prep_workers,
+                                                           thread_name_prefix='image-prep')
+        
+        prepared_images = {}
+        for img_info in page.get_images(full=True):
+            xref = img_info[0]
+            if xref in prepared_images:
+                continue
+            try:
+                # Only decompress images that are actually placed on the page
+                image_rects = page.get_image_rects(xref)
+                if not image_rects:
+                    continue
+                base_image = self._get_base_image(xref)
+            except Exception:
+                # _extract_images retries inline and reports the failure
+                continue
+            if base_image:
+                prepared_images[xref] = (image_rects, self._image_prep_executor.submit(
+                    self._prepare_image, base_image["image"], image_rects[0]
+                ))
+        return prepared_images
+    
+    def _extract_images(self, page: fitz.Page, page_num: int, text_elements: List[Dict[str, Any]] = None, gradient_images: List[Dict[str, Any]] = None,
+                        prepared_images: Dict[int, Tuple[List[fitz.Rect], Future]] = None) -> List[Dict[str, Any]]:
         """
         Extract embedded images (image XObjects) directly from PDF without cropping.
         
@@ -588,11 +808,14 @@ class PDFParser:
             page_num: Page number for naming
             text_elements: Optional list of text elements (used only for re-render decisions)
             gradient_images: Optional list of gradient images already extracted (to avoid duplicates)
+            prepared_images: Optional results of _start_image_prep for this page
             
         Returns:
             List of image element dictionaries
         """
         image_elements = []
+        if prepared_images is None:
+            prepared_images = {}
         image_list = page.get_images(full=True)
         
         # Text elements are only needed for re-render overlap detection
@@ -633,24 +856,34 @@ class PDFParser:
                     logger.debug(f"Page {page_num}: Skipping xref {xref} - already extracted as gradient")
                     continue
                 
-                base_image = self.doc.extract_image(xref)
-                
-                if not base_image:
-                    continue
-                
-                # Get image data
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                
-                # Convert to PIL Image for processing
-                pil_image = Image.open(io.BytesIO(image_bytes))
-                
-                # Get image position on page
-                image_rects = page.get_image_rects(xref)
+                # Get image position on page (already looked up if the image was prepared;
+                # a repeated xref is processed inline)
+                prepared = prepared_images.pop(xref, None)
+                if prepared is not None:
+                    image_rects, prepared_future = prepared
+                else:
+                    image_rects = page.get_image_rects(xref)
                 
                 if image_rects:
+                    # Decompress the image only once it is known to be placed on the page
+                    base_image = self._get_base_image(xref)
+                    
+                    if not base_image:
+                        continue
+                    
+                    # Get image data
+                    image_bytes = base_image["image"]
+                    image_ext = base_image["ext"]
+                    
                     rect = image_rects[0]  # Use first occurrence
                     
+                    # Convert to PIL Image and check its quality (only images placed on the page;
+                    # the pixels are decoded by the quality check, which needs them)
+                    if prepared is not None:
+                        pil_image, quality_result = prepared_future.result()
+                    else:
+                        pil_image, quality_result = self._prepare_image(image_bytes, rect)
+                    
                     # IMPORTANT: Keep all embedded images, including full-page backgrounds
                     # Some full-page backgrounds contain important visual elements (e.g., shield patterns)
                     # The header/footer screenshot mechanism that was causing issues has been removed
@@ -678,7 +911,7 @@ class PDFParser:
                     # The distinction is made later by checking 'was_rerendered' flag
                     
                     # Check image quality and determine action
-                    quality_status, needs_large_image_enhancement = self._check_image_quality(pil_image, rect)
+                    quality_status, needs_large_image_enhancement = quality_result
                     
                     # quality_status: 'good', 'rerender', or 'skip'
                     if quality_status == 'skip':
@@ -932,6 +1165,10 @@ class PDFParser:
             except Exception as e:
                 logger.warning(f"Failed to extract image {img_index} on page {page_num}: {e}")
         
+        # Prepared images that were skipped (e.g. gradients) are not needed
+        for _, prepared_future in prepared_images.values():
+            prepared_future.cancel()
+        
         return image_elements
     
     def _extract_opacity_map(self, page: fitz.Page) -> Dict[str, float]:
@@ -947,29 +1184,26 @@ class PDFParser:
         opacity_map = {}
         
         try:
-            # Get page object definition
-            page_dict = self.doc.xref_object(page.xref, compressed=False)
-            
-            # Find ExtGState resources
-            extgstate_pattern = r'/ExtGState\s*<<([^>]+)>>'
-            match = re.search(extgstate_pattern, page_dict, re.DOTALL)
+            # Look the ExtGState dictionary up directly instead of serializing the
+            # whole page object and regex-searching it. Only an inline /Resources
+            # dictionary is considered, as before: indirect or inherited resources
+            # were never matched by the page-object search.
+            resources_type, _ = self.doc.xref_get_key(page.xref, "Resources")
+            extgstate_type, extgstate_content = (
+                self.doc.xref_get_key(page.xref, "Resources/ExtGState")
+                if resources_type == 'dict' else ('null', 'null')
+            )
             
-            if match:
-                extgstate_content = match.group(1)
+            if extgstate_type == 'dict':
                 # Extract graphics state references with flexible naming
                 # Matches: /GS1, /G3, /a1, /Alpha2, etc.
                 # Pattern: /[Name][OptionalNumber] [xref] 0 R
-                gs_refs = re.findall(r'/([A-Za-z]+\d*)\s+(\d+)\s+\d+\s+R', extgstate_content)
+                gs_refs = _GS_REF_RE.findall(extgstate_content)
                 
                 for gs_name, xref in gs_refs:
                     try:
-                        # Get the graphics state object
-                        gs_obj = self.doc.xref_object(int(xref), compressed=False)
-                        
-                        # Extract fill opacity (ca) and stroke opacity (CA)
-                        ca_match = re.search(r'/ca\s+([\d.]+)', gs_obj)
-                        if ca_match:
-                            opacity = float(ca_match.group(1))
+                        opacity = self._get_gs_opacity(int(xref))
+                        if opacity is not None:
                             opacity_map[gs_name] = opacity
                             logger.debug(f"Extracted opacity: /{gs_name} = {opacity}")
                     except Exception as e:
@@ -980,6 +1214,33 @@ class PDFParser:
         
         return opacity_map
     
+    def _get_gs_opacity(self, xref: int) -> Optional[float]:
+        """
+        Get the fill opacity of an ExtGState object, reading each object once per document.
+        
+        Args:
+            xref: Xref of the graphics state object
+            
+        Returns:
+            Fill opacity (/ca), or None if the object does not set one
+        """
+        if xref in self._gs_opacity_cache:
+            return self._gs_opacity_cache[xref]
+        
+        # Reads stay on the calling thread: a fitz Document must not be used from
+        # several threads at once, and xref_object() holds the GIL throughout, so a
+        # thread pool would add overhead without overlapping anything. The cache
+        # above already limits this to one read per graphics state per document.
+        
+        # Get the graphics state object
+        gs_obj = self.doc.xref_object(xref, compressed=False)
+        
+        # Extract fill opacity (ca); stroke opacity (CA) is not used
+        ca_match = _CA_RE.search(gs_obj)
+        opacity = float(ca_match.group(1)) if ca_match else None
+        self._gs_opacity_cache[xref] = opacity
+        return opacity
+    
     def _extract_drawings(self, page: fitz.Page, opacity_map: Dict[str, float] = None, page_num: int = 0, 
                          text_elements: List[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """
@@ -1106,10 +1367,9 @@ class PDFParser:
             # These shapes have been rendered as images and should not be duplicated as vectors
             if gradient_images:
                 original_count = len(drawing_elements)
-                drawing_elements = [
-                    shape for shape in drawing_elements
-                    if not self.gradient_detector.should_exclude_shape_in_gradient(shape, gradient_images)
-                ]
+                drawing_elements = self.gradient_detector.filter_shapes_outside_gradients(
+                    drawing_elements, gradient_images
+                )
                 excluded_count = original_count - len(drawing_elements)
                 if excluded_count > 0:
                     logger.info(f"Excluded {excluded_count} shape(s) that are part of gradient pattern(s)")
@@ -1127,59 +1387,6 @@ class PDFParser:
         # Gradient images will be added to page elements separately
         return drawing_elements, gradient_images
     
-    def _parse_content_stream_opacity(self, page: fitz.Page, opacity_map: Dict[str, float]) -> List[float]:
-        """
-        Parse content stream to extract opacity for each drawing operation.
-        
-        Args:
-            page: PyMuPDF page object
-            opacity_map: Mapping of graphics state names to opacity values
-            
-        Returns:
-            List of opacity values in drawing order
-        """
-        opacity_sequence = []
-        current_opacity = 1.0
-        
-        try:
-            # Get content stream
-            xref = page.get_contents()[0]
-            content_stream = self.doc.xref_stream(xref).decode('latin-1')
-            
-            # Split by whitespace to get tokens
-            # PDF content stream is a sequence of operators and operands
-            tokens = content_stream.split()
-            
-            i = 0
-            while i < len(tokens):
-                token = tokens[i]
-                
-                # Check for graphics state change: /[Name] gs (flexible pattern)
-                # Matches: /GS1 gs, /G3 gs, /a1 gs, /Alpha gs, etc.
-                if token.startswith('/') and i + 1 < len(tokens) and tokens[i + 1] == 'gs':
-                    gs_match = re.match(r'/([A-Za-z]+\d*)', token)
-                    if gs_match:
-                        gs_name = gs_match.group(1)
-                        current_opacity = opacity_map.get(gs_name, 1.0)
-                        logger.debug(f"Graphics state changed to /{gs_name}, opacity = {current_opacity}")
-                    i += 2
-                    continue
-                
-                # Check for fill operations: 'f' or 'f*'
-                # These indicate a shape has been filled
-                if token in ['f', 'f*']:
-                    opacity_sequence.append(current_opacity)
-                    logger.debug(f"Fill operation #{len(opacity_sequence)}, opacity = {current_opacity}")
-                
-                i += 1
-            
-            logger.debug(f"Extracted {len(opacity_sequence)} opacity values from content stream")
-            
-        except Exception as e:
-            logger.debug(f"Could not parse content stream for opacity: {e}")
-        
-        return opacity_sequence
-    
     def _parse_content_stream_opacity_enhanced(self, page: fitz.Page, opacity_map: Dict[str, float]) -> Dict[tuple, float]:
         """
         Parse content stream to create a sequence of opacity values for filled rectangles.
@@ -1198,49 +1405,53 @@ class PDFParser:
         current_opacity = 1.0
         
         try:
-            # Get content stream
+            # Get content stream as raw bytes: operators and numbers are ASCII,
+            # so there is no need for a decoded str copy of the whole stream
             xref = page.get_contents()[0]
-            content_stream = self.doc.xref_stream(xref).decode('latin-1')
+            content_stream = self.doc.xref_stream(xref)
             
             # Split by whitespace to get tokens
             tokens = content_stream.split()
             
-            # Track recent rectangles before fill
-            recent_rects = []
+            # Only a few tokens are operators of interest: find their indices with
+            # C-level iteration instead of stepping through every token in Python
+            event_indices = compress(range(len(tokens)), map(_OPACITY_EVENT_TOKENS.__contains__, tokens))
             
-            i = 0
-            while i < len(tokens):
+            # Most recent rectangle (width, height) before the next fill
+            recent_rect = None
+            
+            for i in event_indices:
                 token = tokens[i]
                 
                 # Check for graphics state change: /[Name] gs
-                if token.startswith('/') and i + 1 < len(tokens) and tokens[i + 1] == 'gs':
-                    gs_match = re.match(r'/([A-Za-z]+\d*)', token)
-                    if gs_match:
-                        gs_name = gs_match.group(1)
-                        current_opacity = opacity_map.get(gs_name, 1.0)
-                    i += 2
-                    continue
+                if token == b'gs':
+                    if i >= 1 and tokens[i - 1].startswith(b'/'):
+                        gs_match = _GS_NAME_BYTES_RE.match(tokens[i - 1])
+                        if gs_match:
+                            gs_name = gs_match.group(1).decode('ascii')
+                            current_opacity = opacity_map.get(gs_name, 1.0)
                 
                 # Track rectangle construction: x y width height re
-                if token == 're' and i >= 4:
-                    try:
-                        rect_h = float(tokens[i - 1])
-                        rect_w = float(tokens[i - 2])
-                        rect_y = float(tokens[i - 3])
-                        rect_x = float(tokens[i - 4])
-                        recent_rects.append((rect_x, rect_y, abs(rect_w), abs(rect_h)))
-                    except (ValueError, IndexError):
-                        pass
+                elif token == b're':
+                    if i >= 4:
+                        try:
+                            rect_h = float(tokens[i - 1])
+                            rect_w = float(tokens[i - 2])
+                            float(tokens[i - 3])  # y
+                            float(tokens[i - 4])  # x
+                            recent_rect = (abs(rect_w), abs(rect_h))
+                        except ValueError:
+                            pass
                 
                 # Check for fill operations: 'f' or 'f*'
-                if token in ['f', 'f*']:
+                else:
                     # Record opacity for this fill operation
                     opacity_info['sequence'].append(current_opacity)
                     
                     # If we have rectangle info, also store by size
-                    if recent_rects:
+                    if recent_rect is not None:
                         # Use the most recent rectangle before this fill
-                        rect_x, rect_y, rect_w, rect_h = recent_rects[-1]
+                        rect_w, rect_h = recent_rect
                         # Store by size key for matching
                         size_key = (round(rect_w, 0), round(rect_h, 0))
                         if size_key not in opacity_info['by_size']:
@@ -1249,9 +1460,7 @@ class PDFParser:
                         logger.debug(f"Fill op with opacity {current_opacity}, size {size_key}")
                     
                     # Clear rectangle buffer after fill
-                    recent_rects = []
-                
-                i += 1
+                    recent_rect = None
             
             logger.debug(f"Extracted {len(opacity_info['sequence'])} opacity values in sequence")
             logger.debug(f"Size-based groups: {len(opacity_info['by_size'])}")
@@ -1464,29 +1673,85 @@ class PDFParser:
         if len(shapes) <= 1:
             return shapes
         
+        import numpy as np
+        
+        # Struct-of-arrays view of the geometry the duplicate test compares:
+        # one row per shape with x, y, width, height
+        geometry = np.array([(shape['x'], shape['y'], shape['width'], shape['height']) for shape in shapes],
+                            dtype=np.float64)
+        
+        # Duplicates lie within _SHAPE_DUPLICATE_TOLERANCE of each other in x and y.
+        # Sort the shapes once by the cell they fall in on a grid twice that size
+        # (x cell, then y cell): every duplicate of a shape sits in one of the nine
+        # cells around it, and each of those cells is a contiguous run of the sorted
+        # order that searchsorted finds for all shapes at once. The tolerance test is
+        # symmetric, so sweeping the own cell and the four cells ahead of it reaches
+        # every pair once. The key is position only, not fill color: stroke+fill
+        # duplicates differ in fill.
+        # Shapes with non-finite positions never match, so they are left out.
+        tolerance = _SHAPE_DUPLICATE_TOLERANCE
+        finite_indices = np.flatnonzero(np.isfinite(geometry[:, :2]).all(axis=1))
+        cells = np.floor(geometry[finite_indices, :2] / (2 * tolerance)).astype(np.int64)
+        cells[:, 1] -= cells[:, 1].min() - 1 if len(cells) else 0
+        row_span = cells[:, 1].max() + 2 if len(cells) else 1
+        keys = cells[:, 0] * row_span + cells[:, 1]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        sorted_indices = finite_indices[order]
+        
+        pair_firsts, pair_seconds = [], []
+        for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+            neighbour_keys = sorted_keys + (dx * row_span + dy)
+            starts = np.searchsorted(sorted_keys, neighbour_keys, side='left')
+            counts = np.searchsorted(sorted_keys, neighbour_keys, side='right') - starts
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Expand each shape's neighbouring run into explicit (shape, neighbour) pairs
+            run_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            first = np.repeat(sorted_indices, counts)
+            second = sorted_indices[np.repeat(starts, counts) + run_offsets]
+            if dx or dy:
+                first, second = np.minimum(first, second), np.maximum(first, second)
+                near = np.ones(total, dtype=bool)
+            else:
+                # Within one cell every pair shows up in both orders
+                near = first < second
+            # Same position/size tolerance test _are_shapes_overlapping starts with
+            near &= (np.abs(geometry[first] - geometry[second]) <= tolerance).all(axis=1)
+            pair_firsts.append(first[near])
+            pair_seconds.append(second[near])
+        
+        # Later shapes near each shape, in index order
+        neighbours = defaultdict(list)
+        if pair_firsts:
+            firsts = np.concatenate(pair_firsts)
+            seconds = np.concatenate(pair_seconds)
+            pair_order = np.lexsort((seconds, firsts))
+            for i, j in zip(firsts[pair_order].tolist(), seconds[pair_order].tolist()):
+                neighbours[i].append(j)
+        
         deduplicated = []
-        skip_indices = set()
+        merged = [False] * len(shapes)
         
         for i, shape1 in enumerate(shapes):
-            if i in skip_indices:
+            if merged[i]:
                 continue
             
-            # Look for similar shapes
+            # Look for similar shapes among the later shapes near this one, in order
             found_duplicate = False
+            candidates = [j for j in neighbours.get(i, ()) if not merged[j]]
             
-            for j in range(i + 1, len(shapes)):
-                if j in skip_indices:
-                    continue
-                
+            for j in candidates:
                 shape2 = shapes[j]
                 
                 # Check if shapes are nearly identical (overlap detection)
                 if self._are_shapes_overlapping(shape1, shape2):
                     # Merge the shapes, preferring the one with transparency
-                    merged = self._merge_overlapping_shapes(shape1, shape2)
-                    deduplicated.append(merged)
-                    skip_indices.add(i)
-                    skip_indices.add(j)
+                    merged_shape = self._merge_overlapping_shapes(shape1, shape2)
+                    deduplicated.append(merged_shape)
+                    merged[i] = True
+                    merged[j] = True
                     found_duplicate = True
                     
                     logger.debug(f"Merged overlapping shapes: "
@@ -1519,18 +1784,20 @@ class PDFParser:
         Returns:
             True if shapes are overlapping duplicates
         """
-        # Check position overlap first (tolerance: 2pt for slight positioning differences)
-        position_tolerance = 2.0
-        x_overlap = abs(shape1['x'] - shape2['x']) <= position_tolerance
-        y_overlap = abs(shape1['y'] - shape2['y']) <= position_tolerance
+        # Check position overlap first, cheapest rejection first: most pairs are
+        # apart in x or y (tolerance: 2pt for slight positioning differences).
+        # Written as `not <=` so NaN coordinates are rejected as before.
+        position_tolerance = _SHAPE_DUPLICATE_TOLERANCE
+        if not abs(shape1['x'] - shape2['x']) <= position_tolerance:
+            return False
+        if not abs(shape1['y'] - shape2['y']) <= position_tolerance:
+            return False
         
         # Check size similarity (tolerance: 2pt for border width differences)
-        size_tolerance = 2.0
-        width_similar = abs(shape1['width'] - shape2['width']) <= size_tolerance
-        height_similar = abs(shape1['height'] - shape2['height']) <= size_tolerance
-        
-        # If positions don't overlap, not duplicates
-        if not (x_overlap and y_overlap and width_similar and height_similar):
+        size_tolerance = _SHAPE_DUPLICATE_TOLERANCE
+        if not abs(shape1['width'] - shape2['width']) <= size_tolerance:
+            return False
+        if not abs(shape1['height'] - shape2['height']) <= size_tolerance:
             return False
         
         # Case A: Opacity-based duplication (original logic)
@@ -1795,16 +2062,12 @@ class PDFParser:
             return None
         
         if isinstance(color, int):
-            # Convert integer to RGB
-            r = (color >> 16) & 0xFF
-            g = (color >> 8) & 0xFF
-            b = color & 0xFF
-            return f"#{r:02X}{g:02X}{b:02X}"
+            # Integer 0xRRGGBB: one masked format instead of three shifts
+            return "#%06X" % (color & 0xFFFFFF)
         
         if isinstance(color, (list, tuple)) and len(color) >= 3:
             # Convert RGB tuple/list to hex
-            r, g, b = int(color[0] * 255), int(color[1] * 255), int(color[2] * 255)
-            return f"#{r:02X}{g:02X}{b:02X}"
+            return _rgb_components_to_hex(color[0], color[1], color[2])
         
         # Fallback for unexpected color format
         logger.warning(f"Unexpected color format: {color} (type: {type(color)})")
@@ -1886,7 +2149,7 @@ class PDFParser:
             layer_assignments.append((layer, shape))
         
         # Sort by layer (ascending), preserving original order within each layer
-        layer_assignments.sort(key=lambda x: x[0])
+        layer_assignments.sort(key=itemgetter(0))
         
         # Extract sorted shapes
         sorted_shapes = [shape for _, shape in layer_assignments]
@@ -1903,22 +2166,48 @@ class PDFParser:
         """
         Extract elements from all pages in the PDF.
         
+        Holds every page (including image data) in memory at once; prefer
+        iter_pages when the pages can be consumed one by one.
+        
         Returns:
             List of page data dictionaries
         """
+        return list(self.iter_pages())
+    
+    def iter_pages(self) -> Iterator[Dict[str, Any]]:
+        """
+        Extract elements page by page, yielding each page's data as it is ready.
+        
+        With page_workers > 1 (or 0 for one per CPU, capped at 6), pages are
+        spread over worker processes, each of which opens the PDF itself;
+        documents with fewer than 4 pages are always processed sequentially.
+        
+        Yields:
+            Page data dictionaries, in page order
+        """
         if not self.doc:
             logger.error("No PDF document opened")
-            return []
+            return
         
-        all_pages = []
         page_count = len(self.doc)
         
+        cpu_count = os.cpu_count() or 1
+        if self.page_workers == 0:
+            # Page extraction scales up to about 4-6 processes
+            max_workers = min(cpu_count, 6)
+        else:
+            max_workers = min(self.page_workers, cpu_count)
+        if max_workers > 1 and page_count >= 4 and self.pdf_path:
+            logger.info(f"Processing {page_count} pages with {max_workers} worker processes")
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     initializer=_init_page_worker,
+                                     initargs=(self.config, self.pdf_path)) as executor:
+                yield from executor.map(_parse_page_in_worker, range(page_count), chunksize=4)
+            return
+        
         for page_num in range(page_count):
             logger.info(f"Processing page {page_num + 1}/{page_count}")
-            page_data = self.extract_page_elements(page_num)
-            all_pages.append(page_data)
-        
-        return all_pages
+            yield self.extract_page_elements(page_num)
     
     def _check_image_quality(self, pil_image: Image.Image, rect: fitz.Rect = None) -> Tuple[str, bool]:
         """
@@ -2338,7 +2627,7 @@ class PDFParser:
                 
                 # Choose the option with the largest remaining area
                 if shrink_options:
-                    best_option = max(shrink_options, key=lambda opt: opt[2])
+                    best_option = max(shrink_options, key=itemgetter(2))
                     direction, safe_rect, area = best_option
                     logger.debug(f"  Chose best option: shrink {direction}, area={area:.1f}")
                 else:
@@ -2401,7 +2690,7 @@ class PDFParser:
         page_width = page.rect.width
         
         # STEP 1: Extract all text elements from the page
-        text_dict = page.get_text("dict")
+        text_dict = self._get_text_dict(page)
         text_elements = []
         
         for block in text_dict.get("blocks", []):
@@ -2423,7 +2712,7 @@ class PDFParser:
         def is_page_number(elem):
             text = elem['text']
             # Pattern 1: "N/M" format (e.g., "6/10", "1/10")
-            if re.match(r'^\d+/\d+$', text):
+            if _PAGE_FRACTION_RE.match(text):
                 return True
             # Pattern 2: Single number at extreme edge
             if text.isdigit():
@@ -2677,7 +2966,7 @@ class PDFParser:
         page_width = page.rect.width
         
         # STEP 1: Extract text to find content boundaries
-        text_dict = page.get_text("dict")
+        text_dict = self._get_text_dict(page)
         text_elements = []
         for block in text_dict.get("blocks", []):
             if block.get("type") == 0:
@@ -2691,7 +2980,7 @@ class PDFParser:
         # STEP 2: Filter out page numbers
         def is_page_number(elem):
             text = elem['text']
-            if re.match(r'^\d+/\d+$', text):
+            if _PAGE_FRACTION_RE.match(text):
                 return True
             if text.isdigit():
                 bbox = elem['bbox']
@@ -2744,10 +3033,9 @@ class PDFParser:
             # Convert to bytes
             image_data = pix.tobytes("png")
             
-            # Get image dimensions
-            img = Image.open(io.BytesIO(image_data))
-            width_px = img.width
-            height_px = img.height
+            # Get image dimensions (the PNG has the pixmap's size)
+            width_px = pix.width
+            height_px = pix.height
             
             # Create image element
             image_elem = {
@@ -2807,7 +3095,7 @@ class PDFParser:
                 return False
             
             # Pattern 1: "N/M" format (e.g., "6/10", "1/10")
-            if re.match(r'^\d+/\d+$', text):
+            if _PAGE_FRACTION_RE.match(text):
                 return True
             
             # Pattern 2: Single number at extreme edge (centered)
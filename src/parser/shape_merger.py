@@ -296,9 +296,11 @@ class ShapeMerger:
         center1 = self._get_center(shape1)
         center2 = self._get_center(shape2)
         
-        distance = ((center1[0] - center2[0])**2 + (center1[1] - center2[1])**2)**0.5
+        # Compare squared distances; the distance itself is never needed
+        dx = center1[0] - center2[0]
+        dy = center1[1] - center2[1]
         
-        if distance > self.concentric_tolerance:
+        if dx * dx + dy * dy > self.concentric_tolerance * self.concentric_tolerance:
             return None
         
         # Identify outer and inner shapes
@@ -503,10 +505,11 @@ class ShapeMerger:
         center1 = self._get_center(shape1)
         center2 = self._get_center(shape2)
         
-        distance = ((center1[0] - center2[0])**2 + (center1[1] - center2[1])**2)**0.5
+        dx = center1[0] - center2[0]
+        dy = center1[1] - center2[1]
         
-        # Must be very close (within 5 points)
-        if distance > 5.0:
+        # Must be very close (within 5 points), compared squared
+        if dx * dx + dy * dy > 25.0:
             return False
         
         # Check if sizes are similar (within 20%)
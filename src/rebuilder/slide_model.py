@@ -11,6 +11,9 @@ logger = logging.getLogger(__name__)
 class SlideElement:
     """Represents a single element in a slide."""
     
+    # Fixed attribute set: no per-instance __dict__, smaller and faster to access
+    __slots__ = ('type', 'position', 'content', 'style', 'z_index')
+    
     def __init__(self, element_type: str, position: Dict[str, float], 
                  content: Any, style: Dict[str, Any]):
         """